@@ -0,0 +1,138 @@
+"""Static asset pipeline
+
+Minifies the stylesheets and scripts under static/css and static/js, writes
+them to static/dist with a content hash in the filename, precompresses .gz and
+.br siblings for nginx's gzip_static, and records source -> hashed path in
+static/dist/manifest.json. url_for('static', filename='css/style.css') then
+resolves through the manifest, so nginx can cache /static/dist/ forever.
+
+Hashed files from earlier builds are kept: pages cached before a deploy still
+reference them.
+"""
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+import tempfile
+
+import brotli
+import click
+import rcssmin
+import rjsmin
+from flask import current_app
+from flask.cli import AppGroup
+
+STATIC_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST_DIR = 'dist'
+MANIFEST = 'manifest.json'
+SOURCE_DIRS = ('css', 'js')
+MINIFIERS = {'.css': rcssmin.cssmin, '.js': rjsmin.jsmin}
+
+# Relative url(...) references; hashed files live one level deeper than their source
+_CSS_URL = re.compile(r'url\(\s*([\'"]?)(?![a-z][a-z0-9+.-]*:|/|#)([^\'")]+)\1\s*\)', re.I)
+
+_manifest = None
+
+
+def _sources(static_folder):
+    for directory in SOURCE_DIRS:
+        for dirpath, _, filenames in os.walk(os.path.join(static_folder, directory)):
+            for filename in sorted(filenames):
+                if os.path.splitext(filename)[1] in MINIFIERS:
+                    path = os.path.relpath(os.path.join(dirpath, filename), static_folder)
+                    yield path.replace(os.sep, '/')
+
+
+def _write(path, data):
+    # Write then rename, so nginx never serves a half-written file
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, path)
+
+
+def _absolute_css_urls(css, source, static_url_path):
+    base = posixpath.dirname(source)
+
+    def absolute(match):
+        quote, url = match.group(1), match.group(2).strip()
+        return f'url({quote}{static_url_path}/{posixpath.normpath(posixpath.join(base, url))}{quote})'
+
+    return _CSS_URL.sub(absolute, css)
+
+
+def build(static_folder=STATIC_FOLDER, static_url_path='/static'):
+    """Minify, fingerprint and precompress every source; returns the manifest"""
+    global _manifest
+    manifest = {}
+    for source in _sources(static_folder):
+        name, ext = posixpath.splitext(source)
+        with open(os.path.join(static_folder, source), encoding='utf-8') as f:
+            text = f.read()
+        if ext == '.css':
+            text = _absolute_css_urls(text, source, static_url_path)
+        data = MINIFIERS[ext](text).encode('utf-8')
+        target = f'{DIST_DIR}/{name}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+        path = os.path.join(static_folder, target)
+        if not os.path.exists(path):
+            _write(path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+            _write(path + '.br', brotli.compress(data, quality=11))
+            # Last, so an existing hashed file always has its compressed siblings
+            _write(path, data)
+        manifest[source] = target
+
+    _write(os.path.join(static_folder, DIST_DIR, MANIFEST),
+           json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    _manifest = manifest
+    return manifest
+
+
+def manifest():
+    """source path -> hashed path, loaded once per process"""
+    global _manifest
+    if _manifest is None:
+        path = os.path.join(current_app.static_folder, DIST_DIR, MANIFEST)
+        try:
+            with open(path, encoding='utf-8') as f:
+                _manifest = json.load(f)
+        except FileNotFoundError:
+            current_app.logger.warning('No asset manifest at %s; serving unversioned assets', path)
+            _manifest = {}
+    return _manifest
+
+
+def _static_url_defaults(endpoint, values):
+    if endpoint == 'static' and 'filename' in values:
+        target = manifest().get(values['filename'])
+        if target:
+            values['filename'] = target
+
+
+assets_cli = AppGroup('assets', help='Static asset pipeline')
+
+
+@assets_cli.command('build')
+def build_command():
+    """Minify and fingerprint static assets into static/dist"""
+    built = build(current_app.static_folder, current_app.static_url_path)
+    for source, target in sorted(built.items()):
+        click.echo(f'{source} -> {target}')
+
+
+def init_app(app):
+    """Resolve url_for('static') through the manifest and register `flask assets`"""
+    # Debug servers serve the sources so edits show up without a rebuild
+    app.config.setdefault('ASSETS_USE_MANIFEST', not app.debug)
+    if app.config['ASSETS_USE_MANIFEST']:
+        app.url_defaults(_static_url_defaults)
+    app.cli.add_command(assets_cli)
+
+
+if __name__ == '__main__':
+    for source, target in sorted(build().items()):
+        print(f'{source} -> {target}')
@@ -0,0 +1,9 @@
+"""Benchmark suite for the storefront hot paths
+
+Run from the app directory (inside the app container with Docker):
+
+    python seed_data.py --products 100000
+    python -m benchmarks.run --output benchmarks/results/baseline.json
+    python -m benchmarks.load --url http://nginx --duration 30
+    python -m benchmarks.compare benchmarks/results/baseline.json benchmarks/results/latest.json
+"""
@@ -0,0 +1,150 @@
+"""Shared helpers for the benchmark scripts"""
+import json
+import os
+import platform
+import re
+import subprocess
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+import redis
+from sqlalchemy import delete, event
+
+from models import Order, OrderEvent, OrderItem, db
+import orders
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+ORDER_URL = re.compile(r'/cart/order/(\d+)$')
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100.0 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(latencies, queries=None, errors=0):
+    """Latency summary in milliseconds for one scenario"""
+    values = sorted(latencies)
+    summary = {
+        'requests': len(values),
+        'errors': errors,
+        'mean_ms': round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        'p50_ms': round(percentile(values, 50) * 1000, 3),
+        'p95_ms': round(percentile(values, 95) * 1000, 3),
+        'p99_ms': round(percentile(values, 99) * 1000, 3),
+    }
+    if queries:
+        summary['queries_mean'] = round(sum(queries) / len(queries), 2)
+        summary['queries_max'] = max(queries)
+    return summary
+
+
+class CountingRedis:
+    """Wraps a Redis client, counting commands and bytes written"""
+
+    def __init__(self, client):
+        self.client = client
+        self.calls = Counter()
+        self.bytes_written = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if not callable(attr):
+            return attr
+
+        def counted(*args, **kwargs):
+            self.calls[name] += 1
+            if name in ('set', 'setex'):
+                value = kwargs.get('value', args[-1] if args else b'')
+                self.bytes_written += len(value)
+            return attr(*args, **kwargs)
+        return counted
+
+
+class QueryCounter:
+    """Counts SQL statements sent through an engine"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+    @contextmanager
+    def measure(self):
+        start = self.count
+        result = {}
+        yield result
+        result['queries'] = self.count - start
+
+
+def created_order_id(response_location):
+    """Order id from a checkout redirect to the confirmation page, or None"""
+    match = ORDER_URL.search(response_location or '')
+    return int(match.group(1)) if match else None
+
+
+def delete_orders(order_ids):
+    """Delete orders a benchmark run created; returns how many
+
+    The checkout scenarios write real orders; this keeps repeated runs from
+    growing the orders table (and the admin dashboard) of the target database.
+    """
+    ids = sorted(set(order_ids))
+    if not ids:
+        return 0
+    db.session.execute(delete(OrderItem).where(OrderItem.order_id.in_(ids)))
+    db.session.execute(delete(OrderEvent).where(OrderEvent.order_id.in_(ids)))
+    deleted = db.session.execute(delete(Order).where(Order.id.in_(ids))).rowcount
+    db.session.commit()
+    try:
+        orders.refresh_rollup()
+    except redis.RedisError:
+        pass
+    return deleted
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return os.environ.get('GIT_REVISION', 'unknown')
+
+
+def write_results(scenarios, output=None, **meta):
+    """Write a results file comparable with benchmarks.compare"""
+    meta.update({
+        'timestamp': datetime.utcnow().isoformat(),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+    })
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.utcnow().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f'{stamp}.json')
+    with open(output, 'w') as f:
+        json.dump({'meta': meta, 'scenarios': scenarios}, f, indent=2, sort_keys=True)
+    return output
+
+
+def print_table(scenarios):
+    print(f"{'scenario':<32}{'reqs':>7}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}")
+    for name, s in sorted(scenarios.items()):
+        queries = s.get('queries_mean', '-')
+        print(f"{name:<32}{s['requests']:>7}{s['errors']:>5}"
+              f"{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}{queries:>9}")
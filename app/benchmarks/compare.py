@@ -0,0 +1,49 @@
+"""Compare two benchmark result files and report regressions"""
+import argparse
+import json
+import sys
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline, current, threshold=0.10):
+    """Print a side-by-side table and return the list of regressed scenarios"""
+    regressions = []
+    print(f"{'scenario':<32}{'base p95':>10}{'new p95':>10}{'change':>9}{'base q':>8}{'new q':>8}")
+    for name, new in sorted(current['scenarios'].items()):
+        old = baseline['scenarios'].get(name)
+        if old is None:
+            print(f"{name:<32}{'-':>10}{new['p95_ms']:>10.2f}{'new':>9}")
+            continue
+        change = (new['p95_ms'] - old['p95_ms']) / old['p95_ms'] if old['p95_ms'] else 0.0
+        old_q = old.get('queries_mean')
+        new_q = new.get('queries_mean')
+        flag = ''
+        if change > threshold:
+            flag = '  <- slower'
+        if old_q is not None and new_q is not None and new_q > old_q:
+            flag += '  <- more queries'
+        if flag:
+            regressions.append(name)
+        print(f"{name:<32}{old['p95_ms']:>10.2f}{new['p95_ms']:>10.2f}{change:>+9.1%}"
+              f"{old_q if old_q is not None else '-':>8}{new_q if new_q is not None else '-':>8}{flag}")
+    if regressions:
+        print(f"\n{len(regressions)} scenario(s) regressed beyond {threshold:.0%}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=0.10)
+    args = parser.parse_args(argv)
+    regressions = compare(load_results(args.baseline), load_results(args.current), args.threshold)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
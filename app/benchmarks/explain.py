@@ -0,0 +1,82 @@
+"""Run EXPLAIN (ANALYZE, BUFFERS) over the benchmark query set
+
+Flags sequential scans on tables larger than --min-rows so missing indexes
+show up before they show up in production latency.
+"""
+import argparse
+import json
+import sys
+
+from sqlalchemy import text
+
+from app import create_app
+from models import db
+
+from benchmarks.queries import build_queries
+
+
+def _walk(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from _walk(child)
+
+
+def table_sizes(connection):
+    rows = connection.execute(text(
+        "SELECT c.relname, c.reltuples::bigint FROM pg_class c "
+        "JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE c.relkind = 'r' AND n.nspname = current_schema()"
+    ))
+    return {name: rows for name, rows in rows}
+
+
+def explain(connection, statement):
+    compiled = statement.compile(dialect=connection.dialect)
+    result = connection.exec_driver_sql(
+        'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + str(compiled), compiled.params
+    ).scalar()
+    if isinstance(result, str):
+        result = json.loads(result)
+    return result[0]
+
+
+def audit(min_rows=10000, verbose=False):
+    """Return {query name: [flagged relation, ...]} after printing a report"""
+    flagged = {}
+    with db.engine.connect() as connection:
+        sizes = table_sizes(connection)
+        for name, statement in build_queries():
+            report = explain(connection, statement)
+            plan = report['Plan']
+            seq_scans = [
+                node['Relation Name'] for node in _walk(plan)
+                if node['Node Type'] == 'Seq Scan' and sizes.get(node.get('Relation Name'), 0) >= min_rows
+            ]
+            print(f"{name:<28}{report['Execution Time']:>10.2f} ms"
+                  f"  hit={plan.get('Shared Hit Blocks', 0):<8} read={plan.get('Shared Read Blocks', 0):<8}"
+                  + (f"  SEQ SCAN: {', '.join(seq_scans)}" if seq_scans else ''))
+            if verbose:
+                print(json.dumps(plan, indent=2))
+            if seq_scans:
+                flagged[name] = seq_scans
+    return flagged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--min-rows', type=int, default=10000,
+                        help='Only flag sequential scans on tables with at least this many rows')
+    parser.add_argument('--verbose', action='store_true', help='Print full plans')
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    with app.app_context():
+        flagged = audit(args.min_rows, args.verbose)
+    if flagged:
+        print(f"\n{len(flagged)} query(ies) sequentially scan large tables")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
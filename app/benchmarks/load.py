@@ -0,0 +1,167 @@
+"""HTTP load generator for a running deployment (nginx + gunicorn)
+
+Drives the read-path scenarios concurrently over real HTTP so worker, proxy and
+connection pool behaviour show up in the percentiles. Each worker keeps its own
+cookie session, so add-to-cart and view-cart run against a real session cart,
+and workers logged in as a seeded bench user also run the full checkout flow
+(add, shipping, place order). Orders the run creates are deleted at the end
+unless --keep-orders is given; point --url at a throwaway deployment when the
+database is shared.
+"""
+import argparse
+import random
+import secrets
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from app import create_app
+
+from benchmarks.common import created_order_id, delete_orders, print_table, summarize, write_results
+from benchmarks.scenarios import (SHIPPING_FORM, bench_accounts, build_targets, cart_targets,
+                                  checkout_targets)
+
+CHECKOUT = 'cart.process_checkout'
+
+
+class _Client:
+    """One simulated shopper: a cookie session plus its latency samples"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.http = requests.Session()
+        self.samples = {}
+
+    def request(self, scenario, method, path, params=None, data=None):
+        """Timed request; redirects are not followed, so only the handler is measured"""
+        start = time.perf_counter()
+        try:
+            response = self.http.request(method, self.base_url + path, params=params, data=data,
+                                         allow_redirects=False, timeout=30)
+        except requests.RequestException:
+            response = None
+        elapsed = time.perf_counter() - start
+        latencies, errors = self.samples.setdefault(scenario, ([], [0]))
+        latencies.append(elapsed)
+        errors[0] += response is None or response.status_code >= 400
+        return response
+
+    def login(self, email, password):
+        response = self.http.post(self.base_url + '/auth/login',
+                                  data={'email': email, 'password': password},
+                                  allow_redirects=False, timeout=30)
+        # Success redirects; a failed login re-renders the form
+        return response.status_code == 302
+
+    def checkout(self, add_request):
+        """Add a product, submit shipping and place the order; returns the order id"""
+        method, path, params = add_request
+        self.request('cart.add_to_cart', method, path, data=params)
+        self.request('cart.checkout_payment', 'POST', '/cart/checkout/payment', data=SHIPPING_FORM)
+        # Any fresh key exercises the idempotency claim the payment form's key would
+        response = self.request(CHECKOUT, 'POST', '/cart/checkout/process',
+                                data={'idempotency_key': secrets.token_urlsafe(16)})
+        if response is None or response.status_code >= 400:
+            return None
+        order_id = created_order_id(response.headers.get('Location'))
+        if order_id is None:
+            self.samples[CHECKOUT][1][0] += 1  # redirected back to the cart: not placed
+        return order_id
+
+
+def _worker(base_url, targets, deadline, seed, account, results, created, lock):
+    rng = random.Random(seed)
+    client = _Client(base_url)
+    names = list(targets)
+    if CHECKOUT in targets and (account is None or not client.login(*account)):
+        names.remove(CHECKOUT)
+    placed = []
+    while names and time.monotonic() < deadline:
+        scenario = rng.choice(names)
+        if scenario == CHECKOUT:
+            placed.append(client.checkout(rng.choice(targets[CHECKOUT])))
+            continue
+        method, path, params = rng.choice(targets[scenario])
+        if method == 'GET':
+            client.request(scenario, method, path, params=params)
+        else:
+            client.request(scenario, method, path, data=params)
+    with lock:
+        created.extend(order_id for order_id in placed if order_id is not None)
+        for scenario, (latencies, errors) in client.samples.items():
+            merged = results.setdefault(scenario, ([], [0]))
+            merged[0].extend(latencies)
+            merged[1][0] += errors[0]
+
+
+def run_load(base_url, concurrency, duration, seed=1234, scenarios=None, targets=None,
+             accounts=None, keep_orders=False):
+    """Run the load for `duration` seconds and return per-scenario summaries
+
+    `accounts` are (email, password) pairs, one per worker, for the checkout
+    flow; by default the seeded bench users are used.
+    """
+    app = None
+    if targets is None:
+        rng = random.Random(seed)
+        app = create_app()
+        with app.app_context():
+            targets, product_ids = build_targets(rng)
+            targets.update(cart_targets(product_ids, rng))
+            targets.update(checkout_targets(product_ids, rng))
+            if accounts is None:
+                accounts = bench_accounts(concurrency)
+    if scenarios:
+        targets = {k: v for k, v in targets.items() if k.split('[')[0] in scenarios}
+    accounts = accounts or []
+    if CHECKOUT in targets and len(accounts) < concurrency:
+        print(f'Only {len(accounts)} bench account(s) for {concurrency} workers; '
+              'the rest skip checkout (seed with --products)', file=sys.stderr)
+
+    results = {}
+    created = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i in range(concurrency):
+            account = accounts[i] if i < len(accounts) else None
+            pool.submit(_worker, base_url.rstrip('/'), targets, deadline, seed + i, account,
+                        results, created, lock)
+
+    if created and not keep_orders:
+        app = app or create_app()
+        with app.app_context():
+            delete_orders(created)
+
+    summary = {name: summarize(latencies, errors=errors[0]) for name, (latencies, errors) in results.items()}
+    total = sum(s['requests'] for s in summary.values())
+    return summary, total / duration
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--url', default='http://localhost')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--scenario', action='append', help='Limit to these scenarios (repeatable)')
+    parser.add_argument('--keep-orders', action='store_true',
+                        help='Keep the orders the checkout flow creates')
+    parser.add_argument('--output')
+    args = parser.parse_args(argv)
+
+    summary, throughput = run_load(args.url, args.concurrency, args.duration, scenarios=args.scenario,
+                                   keep_orders=args.keep_orders)
+    print_table(summary)
+    print(f"\nThroughput: {throughput:.1f} req/s")
+    output = write_results(summary, args.output, tool='load', url=args.url,
+                           concurrency=args.concurrency, duration=args.duration,
+                           throughput=round(throughput, 2))
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""Calibrate password hashing cost to a target verification time
+
+Raises the cost parameter of each algorithm until a verification takes at
+least --target-ms on this machine, then prints the settings to deploy.
+Run it on the production hardware, inside the app container.
+"""
+import argparse
+import statistics
+import sys
+import time
+
+from passwords import PasswordService
+
+PASSWORD = 'correct horse battery staple'
+
+
+def verify_ms(service, samples):
+    password_hash = service.hash(PASSWORD)
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        service._verify(password_hash, PASSWORD)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate(algorithm, target_ms, samples, memory_kib):
+    """Return (settings, measured ms) for the cheapest cost meeting the target"""
+    if algorithm == 'argon2id':
+        key, value, step = 'ARGON2_TIME_COST', 1, lambda v: v + 1
+        base = {'ARGON2_MEMORY_COST': memory_kib, 'ARGON2_PARALLELISM': 1}
+    elif algorithm == 'bcrypt':
+        key, value, step = 'BCRYPT_LOG_ROUNDS', 10, lambda v: v + 1
+        base = {}
+    else:
+        key, value, step = 'SCRYPT_N', 2 ** 14, lambda v: v * 2
+        base = {'SCRYPT_R': 8, 'SCRYPT_P': 1}
+
+    while True:
+        settings = dict(base, PASSWORD_HASH_ALGORITHM=algorithm, **{key: value})
+        service = PasswordService()
+        service.configure(**settings)
+        elapsed = verify_ms(service, samples)
+        print(f"  {algorithm:<9} {key}={value:<8} {elapsed:8.1f} ms")
+        if elapsed >= target_ms:
+            return settings, elapsed
+        value = step(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--target-ms', type=float, default=250.0,
+                        help='Verification time budget per login')
+    parser.add_argument('--algorithm', choices=['argon2id', 'bcrypt', 'scrypt'], action='append')
+    parser.add_argument('--samples', type=int, default=5)
+    parser.add_argument('--memory-kib', type=int, default=65536, help='argon2id memory cost')
+    args = parser.parse_args(argv)
+
+    for algorithm in args.algorithm or ['argon2id', 'bcrypt', 'scrypt']:
+        settings, elapsed = calibrate(algorithm, args.target_ms, args.samples, args.memory_kib)
+        print(f"\n{algorithm}: {elapsed:.1f} ms per verification")
+        for key, value in settings.items():
+            print(f"  {key}={value}")
+        print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""Representative SQL for the storefront hot paths
+
+Each entry mirrors a query issued by a view, built from sample values so the
+planner sees realistic parameters.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from models import (Brand, Category, Material, Order, OrderItem, Product, Review,
+                    User, Wishlist, db)
+
+
+def _sample(statement, default=None):
+    return db.session.execute(statement.limit(1)).scalar() or default
+
+
+def build_queries():
+    """Return [(name, select statement), ...]"""
+    category_id = _sample(select(Category.id), 1)
+    brand = _sample(select(Brand.name), '')
+    material = _sample(select(Material.name), '')
+    product_id = _sample(select(Product.id).where(Product.active).order_by(Product.id.desc()), 1)
+    order_id = _sample(select(Order.id).order_by(Order.id.desc()), 1)
+    user_id = _sample(select(User.id), 1)
+    month_ago = datetime.utcnow() - timedelta(days=30)
+    active = Product.active.is_(True)
+
+    return [
+        ('main.index featured', select(Product).where(Product.featured.is_(True)).limit(8)),
+        ('main.index categories', select(Category).where(Category.parent_id.is_(None))),
+        ('catalog default', select(Product).where(active).order_by(Product.name).limit(12)),
+        ('catalog category', select(Product).where(active, Product.category_id == category_id)
+            .order_by(Product.name).limit(12)),
+        ('catalog price range', select(Product).where(active, Product.price.between(50, 150))
+            .order_by(Product.price).limit(12)),
+        ('catalog newest', select(Product).where(active).order_by(Product.created_at.desc()).limit(12)),
+        ('catalog brand', select(Product).join(Brand).where(active, Brand.name == brand)
+            .order_by(Product.name).limit(12)),
+        ('catalog material', select(Product).where(active, Product.materials.any(Material.name == material))
+            .order_by(Product.name).limit(12)),
+        ('catalog count', select(func.count()).select_from(Product).where(active, Product.category_id == category_id)),
+        ('detail reviews', select(Review).where(Review.product_id == product_id, Review.approved.is_(True))
+            .order_by(Review.created_at.desc()).limit(10)),
+        ('detail rating', select(func.avg(Review.rating), func.count())
+            .where(Review.product_id == product_id, Review.approved.is_(True))),
+        ('search products', select(Product).where(Product.name.contains('Funda'), active).limit(10)),
+        ('order items', select(OrderItem).where(OrderItem.order_id == order_id)),
+        ('wishlist by user', select(Wishlist).where(Wishlist.user_id == user_id)),
+        ('reset token', select(User).where(User.reset_token == 'does-not-exist')),
+        ('dashboard revenue', select(func.date_trunc('month', Order.created_at), func.sum(Order.total))
+            .where(Order.created_at >= month_ago)
+            .group_by(func.date_trunc('month', Order.created_at))),
+    ]
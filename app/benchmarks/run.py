@@ -0,0 +1,119 @@
+"""In-process benchmark of the hot paths through the Flask test client
+
+Measures latency percentiles and SQL query counts per scenario, including the
+add-to-cart and checkout write paths for a logged-in benchmark user.
+"""
+import argparse
+import random
+import sys
+import time
+
+from app import create_app
+from models import User, db
+
+from benchmarks.common import (QueryCounter, created_order_id, delete_orders, print_table, summarize,
+                               write_results)
+from benchmarks.compare import compare, load_results
+from benchmarks.scenarios import SHIPPING_FORM, build_targets
+
+
+class Recorder:
+    def __init__(self, counter):
+        self.counter = counter
+        self.samples = {}
+
+    def request(self, scenario, client, method, path, **kwargs):
+        start_queries = self.counter.count
+        start = time.perf_counter()
+        response = client.open(path, method=method, **kwargs)
+        elapsed = time.perf_counter() - start
+        latencies, queries, errors = self.samples.setdefault(scenario, ([], [], [0]))
+        latencies.append(elapsed)
+        queries.append(self.counter.count - start_queries)
+        if response.status_code >= 400:
+            errors[0] += 1
+        return response
+
+    def summary(self):
+        return {
+            name: summarize(latencies, queries, errors[0])
+            for name, (latencies, queries, errors) in self.samples.items()
+        }
+
+
+def _bench_user():
+    user = User.query.filter_by(email='bench0@example.com').first()
+    if user is None:
+        user = User.query.filter_by(is_admin=False).first()
+    return user
+
+
+def run(iterations, warmup, seed, keep_orders=False):
+    app = create_app()
+    rng = random.Random(seed)
+    created = []
+    with app.app_context():
+        targets, product_ids = build_targets(rng)
+        user = _bench_user()
+        counter = QueryCounter(db.engine)
+        recorder = Recorder(counter)
+        client = app.test_client()
+
+        with counter:
+            for i in range(warmup + iterations):
+                if i == warmup:
+                    recorder.samples.clear()
+                for scenario, requests in targets.items():
+                    method, path, params = rng.choice(requests)
+                    recorder.request(scenario, client, method, path, query_string=params)
+
+                if not product_ids:
+                    continue
+                product_id = rng.choice(product_ids)
+                recorder.request('cart.add_to_cart', client, 'POST',
+                                 f'/cart/add/{product_id}', data={'quantity': 1})
+
+                if user is not None:
+                    with client.session_transaction() as sess:
+                        sess['_user_id'] = str(user.id)
+                        sess['_fresh'] = True
+                    client.post('/cart/checkout/payment', data=SHIPPING_FORM)
+                    response = recorder.request('cart.process_checkout', client, 'POST',
+                                                '/cart/checkout/process')
+                    created.append(created_order_id(response.location))
+                    with client.session_transaction() as sess:
+                        sess.pop('_user_id', None)
+
+        if not keep_orders:
+            delete_orders(filter(None, created))
+        catalog_size = db.session.execute(db.text('SELECT count(*) FROM products')).scalar()
+        return recorder.summary(), catalog_size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--output', help='Results file (default: benchmarks/results/<timestamp>.json)')
+    parser.add_argument('--baseline', help='Compare against this results file and fail on regressions')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Allowed relative p95 increase before flagging a regression')
+    parser.add_argument('--keep-orders', action='store_true',
+                        help='Keep the orders the checkout scenario creates')
+    args = parser.parse_args(argv)
+
+    scenarios, catalog_size = run(args.iterations, args.warmup, args.seed, args.keep_orders)
+    print_table(scenarios)
+    output = write_results(scenarios, args.output, tool='run', iterations=args.iterations,
+                           catalog_size=catalog_size)
+    print(f"\nResults written to {output}")
+
+    if args.baseline:
+        regressions = compare(load_results(args.baseline), load_results(output), args.threshold)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
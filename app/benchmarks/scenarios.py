@@ -0,0 +1,95 @@
+"""Request mix for the storefront hot paths
+
+Targets are sampled from the database so the same scenarios work against any
+seeded scale.
+"""
+import random
+
+from models import Brand, Category, Material, Product, User
+
+# Password seed_synthetic() gives every bench{i}@example.com user
+BENCH_PASSWORD = 'benchmark123'
+
+SHIPPING_FORM = {
+    'first_name': 'Bench',
+    'last_name': 'User',
+    'address': 'Calle Falsa 123',
+    'city': 'Madrid',
+    'state': 'Madrid',
+    'zip_code': '28001',
+    'country': 'España',
+    'phone': '+34 600 000 000',
+}
+
+CATALOG_FILTERS = [
+    {},
+    {'sort': 'price_asc'},
+    {'sort': 'newest'},
+    {'page': 5},
+    {'category': '{category}'},
+    {'category': '{category}', 'sort': 'price_desc'},
+    {'brand': '{brand}'},
+    {'material': '{material}'},
+    {'min_price': 50, 'max_price': 150},
+    {'category': '{category}', 'brand': '{brand}', 'min_price': 80},
+]
+
+
+def _fill(params, values):
+    return {k: (v.format(**values) if isinstance(v, str) else v) for k, v in params.items()}
+
+
+def build_targets(rng=None, samples=50):
+    """Return {scenario: [(method, path, params), ...]} for the read paths"""
+    rng = rng or random.Random(1234)
+    product_ids = [row[0] for row in Product.query.with_entities(Product.id)
+                   .filter_by(active=True).order_by(Product.id).limit(samples * 20)]
+    names = [row[0] for row in Product.query.with_entities(Product.name)
+             .filter_by(active=True).order_by(Product.id).limit(samples)]
+    category_ids = [row[0] for row in Category.query.with_entities(Category.id)]
+    brand_names = [row[0] for row in Brand.query.with_entities(Brand.name)]
+    material_names = [row[0] for row in Material.query.with_entities(Material.name)]
+
+    targets = {
+        'main.index': [('GET', '/', {})],
+        'products.detail': [
+            ('GET', f'/products/{pid}', {}) for pid in rng.sample(product_ids, min(samples, len(product_ids)))
+        ],
+        'api.search_products': [
+            ('GET', '/api/products/search', {'q': name[:rng.randint(3, max(3, len(name)))], 'limit': 5})
+            for name in names
+        ],
+    }
+    for i, params in enumerate(CATALOG_FILTERS):
+        values = {
+            'category': rng.choice(category_ids) if category_ids else '',
+            'brand': rng.choice(brand_names) if brand_names else '',
+            'material': rng.choice(material_names) if material_names else '',
+        }
+        targets[f'products.catalog[{i}]'] = [('GET', '/products/catalog', _fill(params, values))]
+    return targets, product_ids
+
+
+def cart_targets(product_ids, rng=None, samples=50):
+    """Session-backed cart paths: add a product, then view the cart"""
+    rng = rng or random.Random(1234)
+    picked = rng.sample(product_ids, min(samples, len(product_ids)))
+    return {
+        'cart.add_to_cart': [('POST', f'/cart/add/{pid}', {'quantity': 1}) for pid in picked],
+        'cart.view_cart': [('GET', '/cart/', {})],
+    }
+
+
+def checkout_targets(product_ids, rng=None, samples=50):
+    """Products a logged-in checkout flow adds to the cart before paying"""
+    rng = rng or random.Random(1234)
+    picked = rng.sample(product_ids, min(samples, len(product_ids)))
+    return {'cart.process_checkout': [('POST', f'/cart/add/{pid}', {'quantity': 1}) for pid in picked]}
+
+
+def bench_accounts(limit):
+    """(email, password) of synthetic users, one per concurrent session"""
+    emails = [row[0] for row in User.query.with_entities(User.email)
+              .filter(User.email.like('bench%@example.com'), User.is_active.is_(True))
+              .order_by(User.id).limit(limit)]
+    return [(email, BENCH_PASSWORD) for email in emails]
@@ -0,0 +1,88 @@
+"""Count Redis session operations per page view
+
+Replays an anonymous browsing session (catalog, product pages, add to cart,
+cart views, cart count polls) through the Flask test client, once with
+Flask-Session's stock pickle interface and once with sessions.py, and reports
+Redis reads, writes and bytes written per request.
+"""
+import argparse
+import random
+import sys
+
+from flask_session.sessions import RedisSessionInterface
+
+from app import create_app
+from models import Product
+import sessions
+
+from benchmarks.common import CountingRedis
+
+
+def browse(client, product_ids, rng, views):
+    """An anonymous visit: mostly reads, a few cart writes"""
+    paths = []
+    for _ in range(views):
+        roll = rng.random()
+        if roll < 0.3:
+            paths.append(('GET', '/products/catalog', {}))
+        elif roll < 0.6:
+            paths.append(('GET', f'/products/{rng.choice(product_ids)}', {}))
+        elif roll < 0.7:
+            paths.append(('POST', f'/cart/add/{rng.choice(product_ids)}', {'quantity': 1}))
+        elif roll < 0.85:
+            paths.append(('GET', '/cart/', {}))
+        else:
+            paths.append(('GET', '/api/cart/count', {}))
+    for method, path, data in paths:
+        client.open(path, method=method, data=data)
+    return len(paths)
+
+
+def measure(app, interface, product_ids, seed, visitors, views):
+    counting = CountingRedis(interface.redis)
+    interface.redis = counting
+    # metrics wraps the interface; swap the inner one so timing still applies
+    app.session_interface.inner = interface
+    rng = random.Random(seed)
+    requests = 0
+    for _ in range(visitors):
+        requests += browse(app.test_client(), product_ids, rng, views)
+    return counting.calls, counting.bytes_written, requests
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--visitors', type=int, default=20)
+    parser.add_argument('--views', type=int, default=25, help='Requests per visitor')
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    config = app.config
+    interfaces = {
+        'flask-session (pickle)': RedisSessionInterface(
+            config['SESSION_REDIS'], config['SESSION_KEY_PREFIX'] + 'bench:',
+            config['SESSION_USE_SIGNER'], config['SESSION_PERMANENT']),
+        'lean (json, elided)': sessions.LeanRedisSessionInterface(
+            config['SESSION_REDIS'], config['SESSION_KEY_PREFIX'] + 'bench:',
+            config['SESSION_USE_SIGNER'], config['SESSION_PERMANENT']),
+    }
+    with app.app_context():
+        product_ids = [row[0] for row in Product.query.with_entities(Product.id)
+                       .filter_by(active=True).limit(200)]
+    if not product_ids:
+        raise SystemExit('No products; run seed_data.py first')
+
+    print(f"{'interface':<26}{'requests':>9}{'reads/req':>11}{'writes/req':>12}{'bytes/write':>13}")
+    for name, interface in interfaces.items():
+        calls, written, requests = measure(app, interface, product_ids, args.seed,
+                                           args.visitors, args.views)
+        reads = calls['get']
+        writes = calls['setex'] + calls['set'] + calls['delete'] + calls['expire']
+        per_write = written / writes if writes else 0
+        print(f"{name:<26}{requests:>9}{reads / requests:>11.2f}{writes / requests:>12.2f}{per_write:>13.0f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
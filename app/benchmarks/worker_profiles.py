@@ -0,0 +1,106 @@
+"""Compare gunicorn worker profiles on the catalog and cart endpoints
+
+Starts gunicorn once per profile (sync, gthread, gevent) on a local port with
+the production gunicorn.conf.py, drives catalog pages and session-backed cart
+requests through benchmarks.load, and prints throughput and p95 per profile.
+Run it inside the app container so the workers reach Postgres and Redis.
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+from app import create_app
+
+from benchmarks.common import print_table, write_results
+from benchmarks.load import run_load
+from benchmarks.scenarios import build_targets, cart_targets
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILES = ('sync', 'gthread', 'gevent')
+
+
+def _targets(seed):
+    app = create_app()
+    with app.app_context():
+        targets, product_ids = build_targets(random.Random(seed))
+    targets = {k: v for k, v in targets.items() if k.startswith('products.catalog')}
+    targets.update(cart_targets(product_ids, random.Random(seed)))
+    return targets
+
+
+def _wait_ready(base_url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(base_url + '/cart/', timeout=2).status_code < 500:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f'gunicorn did not become ready at {base_url}')
+
+
+def start_gunicorn(profile, port, workers=None):
+    env = dict(os.environ, GUNICORN_PROFILE=profile,
+               PROMETHEUS_MULTIPROC_DIR=tempfile.mkdtemp(prefix=f'bench-{profile}-'))
+    if workers:
+        env['GUNICORN_WORKERS'] = str(workers)
+    return subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py',
+         '--bind', f'127.0.0.1:{port}', 'wsgi:app'],
+        cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--profile', action='append', choices=PROFILES)
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--workers', type=int, help='Override the CPU-derived worker count')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--output')
+    args = parser.parse_args(argv)
+
+    targets = _targets(args.seed)
+    base_url = f'http://127.0.0.1:{args.port}'
+    results = {}
+    for profile in args.profile or PROFILES:
+        server = start_gunicorn(profile, args.port, args.workers)
+        try:
+            _wait_ready(base_url)
+            summary, throughput = run_load(base_url, args.concurrency, args.duration,
+                                           seed=args.seed, targets=targets)
+        finally:
+            server.terminate()
+            server.wait(timeout=60)
+        print(f"\n== {profile}: {throughput:.1f} req/s")
+        print_table(summary)
+        results[profile] = {'throughput': round(throughput, 2), 'scenarios': summary}
+
+    print(f"\n{'profile':<10} {'req/s':>9} {'p95 catalog':>12} {'p95 cart':>10}")
+    for profile, result in results.items():
+        scenarios = result['scenarios']
+        catalog = max((s['p95_ms'] for k, s in scenarios.items() if k.startswith('products.catalog')), default=0)
+        cart = max((s['p95_ms'] for k, s in scenarios.items() if k.startswith('cart.')), default=0)
+        print(f"{profile:<10} {result['throughput']:9.1f} {catalog:12.1f} {cart:10.1f}")
+
+    # Flattened as profile:scenario so benchmarks.compare can diff two runs
+    flat = {f'{profile}:{name}': s for profile, result in results.items()
+            for name, s in result['scenarios'].items()}
+    output = write_results(flat, args.output, tool='worker_profiles',
+                           concurrency=args.concurrency, duration=args.duration,
+                           throughput={p: r['throughput'] for p, r in results.items()})
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,14 @@
 from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash
 from flask_login import login_required, current_user
 from functools import wraps
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from models import db, Order, Product, User, Review
+import http_cache
+import moderation
+import newsletter
+import refdata
+import orders as order_states
 
 bp = Blueprint('admin', __name__)
 
@@ -14,16 +22,55 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def _refresh_product_pages(product_id):
+    """Refresh the micro-cached pages that show a product"""
+    http_cache.refresh([
+        url_for('products.detail', product_id=product_id),
+        url_for('main.index'),
+        url_for('products.catalog'),
+    ])
+
+def _bulk_payload():
+    """Bulk actions accept a checkbox form or a JSON object"""
+    if request.is_json:
+        payload = request.get_json(silent=True)
+        return payload if isinstance(payload, dict) else {}
+    return request.form
+
+def _selected_ids(field):
+    """Ids picked in a list view; None if a JSON body sends something other than a list"""
+    payload = _bulk_payload()
+    if hasattr(payload, 'getlist'):
+        values = payload.getlist(field)
+    else:
+        values = payload.get(field, [])
+        if not isinstance(values, list):
+            return None
+    ids = set()
+    for value in values:
+        try:
+            ids.add(int(value))
+        except (TypeError, ValueError):
+            continue
+    return sorted(ids)
+
+def _bulk_response(message, redirect_to, **data):
+    if request.is_json:
+        return jsonify(success=True, message=message, **data)
+    flash(message, 'success')
+    return redirect(redirect_to)
+
+def _bulk_error(message, redirect_to):
+    if request.is_json:
+        return jsonify(success=False, message=message), 400
+    flash(message, 'error')
+    return redirect(redirect_to)
+
 @bp.route('/')
 @login_required
 @admin_required
 def dashboard():
     """Admin dashboard with metrics"""
-    from app.models import Order, Product, User
-    from app import db
-    from sqlalchemy import func
-    from datetime import datetime, timedelta
-    
     # Calculate metrics
     today = datetime.utcnow().date()
     week_ago = today - timedelta(days=7)
@@ -31,7 +78,7 @@ def dashboard():
     
     total_orders = Order.query.count()
     total_revenue = db.session.query(func.sum(Order.total)).scalar() or 0
-    pending_orders = Order.query.filter_by(status='pending').count()
+    pending_orders = order_states.status_count('pending')
     total_products = Product.query.count()
     total_users = User.query.count()
     
@@ -65,8 +112,6 @@ def orders():
     page = request.args.get('page', 1, type=int)
     status = request.args.get('status')
     
-    from app.models import Order
-    
     query = Order.query
     
     if status:
@@ -83,8 +128,6 @@ def orders():
 @admin_required
 def order_detail(order_id):
     """Order detail view"""
-    from app.models import Order
-    
     order = Order.query.get_or_404(order_id)
     
     return render_template('admin/order_detail.html', order=order)
@@ -94,24 +137,50 @@ def order_detail(order_id):
 @admin_required
 def update_order_status(order_id):
     """Update order status"""
-    from app.models import Order
-    from app import db
-    
     order = Order.query.get_or_404(order_id)
     new_status = request.form.get('status')
-    tracking_number = request.form.get('tracking_number')
-    
-    order.status = new_status
-    if tracking_number:
-        order.tracking_number = tracking_number
-    
-    db.session.commit()
-    
-    # TODO: Send email notification to customer
+    tracking_number = request.form.get('tracking_number') or None
+    
+    if new_status == order.status:
+        # Same status: only the tracking number can change
+        if tracking_number:
+            order.tracking_number = tracking_number
+            db.session.commit()
+    else:
+        try:
+            order_states.transition(order, new_status, actor=current_user,
+                                    tracking_number=tracking_number)
+        except order_states.InvalidTransition as e:
+            flash(str(e), 'error')
+            return redirect(url_for('admin.order_detail', order_id=order_id))
+        # One write; customer email and rollups are queued after commit
+        db.session.commit()
     
     flash(f'Estado del pedido #{order.order_number} actualizado', 'success')
     return redirect(url_for('admin.order_detail', order_id=order_id))
 
+@bp.route('/orders/bulk-status', methods=['POST'])
+@login_required
+@admin_required
+def bulk_update_order_status():
+    """Move the selected orders to a status in one statement"""
+    order_ids = _selected_ids('order_ids')
+    if order_ids is None:
+        return _bulk_error('Selección no válida', url_for('admin.orders'))
+    new_status = _bulk_payload().get('status')
+    try:
+        moved = order_states.transition_many(order_ids, new_status, actor=current_user)
+    except order_states.InvalidTransition as e:
+        return _bulk_error(str(e), url_for('admin.orders'))
+    # Events for every moved order go to the queue together after this commit
+    db.session.commit()
+    
+    skipped = len(order_ids) - len(moved)
+    message = f'{len(moved)} pedidos actualizados'
+    if skipped:
+        message += f' ({skipped} no admiten ese cambio de estado)'
+    return _bulk_response(message, url_for('admin.orders'), updated=moved)
+
 @bp.route('/products')
 @login_required
 @admin_required
@@ -120,8 +189,6 @@ def products():
     page = request.args.get('page', 1, type=int)
     category_id = request.args.get('category')
     
-    from app.models import Product, Category
-    
     query = Product.query
     
     if category_id:
@@ -131,11 +198,9 @@ def products():
         page=page, per_page=20, error_out=False
     )
     
-    categories = Category.query.all()
-    
     return render_template('admin/products.html', 
                          products=products, 
-                         categories=categories,
+                         categories=refdata.categories().ordered(),
                          current_category=category_id)
 
 @bp.route('/products/new', methods=['GET', 'POST'])
@@ -144,9 +209,6 @@ def products():
 def new_product():
     """Create new product"""
     if request.method == 'POST':
-        from app.models import Product
-        from app import db
-        
         product = Product(
             name=request.form.get('name'),
             description=request.form.get('description'),
@@ -161,26 +223,22 @@ def new_product():
         
         db.session.add(product)
         db.session.commit()
+        _refresh_product_pages(product.id)
         
         flash(f'Producto "{product.name}" creado exitosamente', 'success')
         return redirect(url_for('admin.products'))
     
-    from app.models import Category, Brand
-    categories = Category.query.all()
-    brands = Brand.query.all()
+    ref = refdata.snapshot()
     
     return render_template('admin/product_form.html', 
-                         categories=categories, 
-                         brands=brands)
+                         categories=ref.categories.ordered(), 
+                         brands=ref.brands)
 
 @bp.route('/products/<int:product_id>/edit', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def edit_product(product_id):
     """Edit existing product"""
-    from app.models import Product
-    from app import db
-    
     product = Product.query.get_or_404(product_id)
     
     if request.method == 'POST':
@@ -195,18 +253,17 @@ def edit_product(product_id):
         product.featured = request.form.get('featured') == 'on'
         
         db.session.commit()
+        _refresh_product_pages(product.id)
         
         flash(f'Producto "{product.name}" actualizado exitosamente', 'success')
         return redirect(url_for('admin.products'))
     
-    from app.models import Category, Brand
-    categories = Category.query.all()
-    brands = Brand.query.all()
+    ref = refdata.snapshot()
     
     return render_template('admin/product_form.html', 
                          product=product,
-                         categories=categories, 
-                         brands=brands)
+                         categories=ref.categories.ordered(), 
+                         brands=ref.brands)
 
 @bp.route('/customers')
 @login_required
@@ -215,8 +272,6 @@ def customers():
     """Customer management"""
     page = request.args.get('page', 1, type=int)
     
-    from app.models import User
-    
     users = User.query.order_by(User.created_at.desc()).paginate(
         page=page, per_page=20, error_out=False
     )
@@ -228,8 +283,6 @@ def customers():
 @admin_required
 def customer_detail(user_id):
     """Customer detail view"""
-    from app.models import User, Order
-    
     user = User.query.get_or_404(user_id)
     orders = Order.query.filter_by(user_id=user_id).order_by(Order.created_at.desc()).all()
     
@@ -243,8 +296,6 @@ def reviews():
     page = request.args.get('page', 1, type=int)
     status = request.args.get('status', 'pending')
     
-    from app.models import Review
-    
     query = Review.query
     
     if status == 'pending':
@@ -263,16 +314,56 @@ def reviews():
 @admin_required
 def approve_review(review_id):
     """Approve review"""
-    from app.models import Review
-    from app import db
-    
     review = Review.query.get_or_404(review_id)
-    review.approved = True
+    _, product_ids = moderation.approve([review.id])
     db.session.commit()
+    http_cache.refresh([url_for('products.detail', product_id=product_id) for product_id in product_ids])
     
     flash('Reseña aprobada', 'success')
     return redirect(url_for('admin.reviews'))
 
+@bp.route('/reviews/bulk', methods=['POST'])
+@login_required
+@admin_required
+def bulk_moderate_reviews():
+    """Approve or reject the selected reviews in one statement"""
+    review_ids = _selected_ids('review_ids')
+    if review_ids is None:
+        return _bulk_error('Selección no válida', url_for('admin.reviews'))
+    action = _bulk_payload().get('action')
+    if action == 'approve':
+        count, product_ids = moderation.approve(review_ids)
+        message = f'{count} reseñas aprobadas'
+    elif action == 'reject':
+        count, product_ids = moderation.reject(review_ids)
+        message = f'{count} reseñas rechazadas'
+    else:
+        return _bulk_error('Acción no válida', url_for('admin.reviews'))
+    db.session.commit()
+    
+    http_cache.refresh([url_for('products.detail', product_id=product_id) for product_id in product_ids])
+    return _bulk_response(message, url_for('admin.reviews', status=request.args.get('status', 'pending')),
+                          products=sorted(product_ids))
+
+@bp.route('/newsletter/import', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def import_newsletter():
+    """Bulk import newsletter subscribers from a CSV of emails"""
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash('Selecciona un archivo CSV', 'error')
+            return redirect(url_for('admin.import_newsletter'))
+        
+        stats = newsletter.import_csv(upload.stream)
+        flash(f"{stats['imported']} suscriptores importados "
+              f"({stats['existing']} ya existían, {stats['duplicates']} duplicados, "
+              f"{stats['invalid']} no válidos)", 'success')
+        return redirect(url_for('admin.import_newsletter'))
+    
+    return render_template('admin/newsletter_import.html')
+
 @bp.route('/settings')
 @login_required
 @admin_required
@@ -1,30 +1,43 @@
-from flask import Blueprint, request, jsonify, url_for
+import math
+
+from flask import Blueprint, request, jsonify, url_for, session, abort
 from flask_login import login_required, current_user
+from flask_mail import Message
+from models import Product, EquipmentProfile
+from extensions import mail
+from fitment import DEFAULT_TOLERANCE_CM, products_fitting, products_fitting_profile
+from http_cache import cache_control
+import newsletter
+import read_models
+import refdata
+import wishlist
 
 bp = Blueprint('api', __name__)
 
+SEARCH_MAX_LIMIT = 20
+FIT_MAX_LIMIT = 50
+
 @bp.route('/cart/count')
 def cart_count():
     """Get current cart count"""
-    from flask import session
     cart = session.get('cart', {})
     return jsonify({'count': len(cart)})
 
 @bp.route('/products/search')
+@cache_control(max_age=60, stale_while_revalidate=300)
 def search_products():
     """AJAX product search"""
     query = request.args.get('q', '')
-    limit = request.args.get('limit', 10, type=int)
+    limit = min(max(request.args.get('limit', 10, type=int), 1), SEARCH_MAX_LIMIT)
     
     if not query:
         return jsonify([])
     
-    from app.models import Product
-    
-    products = Product.query.filter(
-        Product.name.contains(query),
+    # Literal substring match: the autocomplete filters cached results the same way
+    products = read_models.cards(read_models.card_select(
+        Product.name.contains(query, autoescape=True),
         Product.active == True
-    ).limit(limit).all()
+    ).order_by(Product.name).limit(limit))
     
     results = []
     for product in products:
@@ -41,11 +54,10 @@ def search_products():
 @bp.route('/products/filters')
 def product_filters():
     """Get available filter options"""
-    from app.models import Brand, Material, Category
-    
-    brands = [{'id': b.id, 'name': b.name} for b in Brand.query.all()]
-    materials = [{'id': m.id, 'name': m.name} for m in Material.query.all()]
-    categories = [{'id': c.id, 'name': c.name} for c in Category.query.all()]
+    ref = refdata.snapshot()
+    brands = [{'id': b.id, 'name': b.name} for b in ref.brands]
+    materials = [{'id': m.id, 'name': m.name} for m in ref.materials]
+    categories = [{'id': c.id, 'name': c.name} for c in ref.categories.ordered()]
     
     return jsonify({
         'brands': brands,
@@ -53,12 +65,74 @@ def product_filters():
         'categories': categories
     })
 
+def _fit_results(products, width, height, depth):
+    return [{
+        'id': product.id,
+        'name': product.name,
+        'price': float(product.price),
+        'image': product.main_image,
+        'url': url_for('products.detail', product_id=product.id),
+        'dimensions': {
+            'width': product.width_cm,
+            'height': product.height_cm,
+            'depth': product.depth_cm
+        },
+        # Extra room around the equipment on each axis (cm)
+        'clearance': {
+            'width': round(product.width_cm - width, 2),
+            'height': round(product.height_cm - height, 2),
+            'depth': round(product.depth_cm - depth, 2)
+        } if product.width_cm is not None else None
+    } for product in products]
+
+def _fit_args():
+    """tolerance and limit query args for the fit endpoints; tolerance None if not a number"""
+    tolerance = request.args.get('tolerance', DEFAULT_TOLERANCE_CM, type=float)
+    if not math.isfinite(tolerance):
+        tolerance = None
+    limit = min(max(request.args.get('limit', 20, type=int), 1), FIT_MAX_LIMIT)
+    return tolerance, limit
+
+@bp.route('/products/fits')
+def products_that_fit():
+    """Products that fit the given equipment dimensions (cm)"""
+    width = request.args.get('width', type=float)
+    height = request.args.get('height', type=float)
+    depth = request.args.get('depth', type=float)
+    tolerance, limit = _fit_args()
+    
+    if not all(value and value > 0 and math.isfinite(value) for value in (width, height, depth)):
+        return jsonify({'error': 'Dimensiones inválidas'}), 400
+    if tolerance is None:
+        return jsonify({'error': 'Tolerancia inválida'}), 400
+    
+    products = products_fitting(width, height, depth, tolerance=tolerance, limit=limit)
+    return jsonify(_fit_results(products, width, height, depth))
+
+@bp.route('/equipment/<int:profile_id>/fits')
+@login_required
+def equipment_fits(profile_id):
+    """Products that fit one of the user's saved equipment profiles"""
+    profile = EquipmentProfile.query.filter_by(
+        id=profile_id,
+        user_id=current_user.id
+    ).first_or_404()
+    tolerance, limit = _fit_args()
+    
+    if profile.width_cm is None:
+        return jsonify({'error': 'El perfil no tiene dimensiones válidas'}), 400
+    if tolerance is None:
+        return jsonify({'error': 'Tolerancia inválida'}), 400
+    
+    products = products_fitting_profile(profile, tolerance=tolerance, limit=limit)
+    return jsonify({
+        'profile': {'id': profile.id, 'name': profile.name},
+        'products': _fit_results(products, profile.width_cm, profile.height_cm, profile.depth_cm)
+    })
+
 @bp.route('/contact', methods=['POST'])
 def contact_form():
     """Handle contact form submission"""
-    from app import mail
-    from flask_mail import Message
-    
     name = request.form.get('name')
     email = request.form.get('email')
     subject = request.form.get('subject', 'Consulta desde el sitio web')
@@ -92,22 +166,15 @@ Mensaje:
 @bp.route('/newsletter/subscribe', methods=['POST'])
 def newsletter_subscribe():
     """Newsletter subscription"""
-    from app.models import NewsletterSubscriber
-    from app import db
-    
-    email = request.form.get('email')
-    
-    if not email:
+    if not request.form.get('email'):
         return jsonify({'error': 'Email requerido'}), 400
     
-    # Check if already subscribed
-    existing = NewsletterSubscriber.query.filter_by(email=email).first()
-    if existing:
-        return jsonify({'message': 'Ya estás suscrito a nuestro newsletter'})
+    email = newsletter.normalize(request.form.get('email'))
+    if email is None:
+        return jsonify({'error': 'Email no válido'}), 400
     
-    subscriber = NewsletterSubscriber(email=email)
-    db.session.add(subscriber)
-    db.session.commit()
+    if newsletter.subscribe(email) == 'exists':
+        return jsonify({'message': 'Ya estás suscrito a nuestro newsletter'})
     
     return jsonify({'message': 'Suscripción exitosa'})
 
@@ -115,43 +182,43 @@ def newsletter_subscribe():
 @login_required
 def add_to_wishlist(product_id):
     """Add product to wishlist"""
-    from app.models import Wishlist, Product
-    from app import db
-    
-    product = Product.query.get_or_404(product_id)
-    
-    # Check if already in wishlist
-    existing = Wishlist.query.filter_by(
-        user_id=current_user.id,
-        product_id=product_id
-    ).first()
-    
-    if existing:
+    if wishlist.add(current_user.id, [product_id]):
+        return jsonify({'message': 'Producto agregado a tu lista de deseos'})
+    if product_id in wishlist.product_ids(current_user.id):
         return jsonify({'message': 'Producto ya está en tu lista de deseos'})
-    
-    wishlist_item = Wishlist(
-        user_id=current_user.id,
-        product_id=product_id
-    )
-    
-    db.session.add(wishlist_item)
-    db.session.commit()
-    
-    return jsonify({'message': 'Producto agregado a tu lista de deseos'})
+    abort(404)
 
 @bp.route('/wishlist/remove/<int:product_id>', methods=['DELETE'])
 @login_required
 def remove_from_wishlist(product_id):
     """Remove product from wishlist"""
-    from app.models import Wishlist
-    from app import db
+    if not wishlist.remove(current_user.id, [product_id]):
+        abort(404)
     
-    wishlist_item = Wishlist.query.filter_by(
-        user_id=current_user.id,
-        product_id=product_id
-    ).first_or_404()
+    return jsonify({'message': 'Producto eliminado de tu lista de deseos'})
+
+@bp.route('/wishlist/sync', methods=['POST'])
+@login_required
+def sync_wishlist():
+    """Apply many wishlist changes at once: {"add": [ids], "remove": [ids]}"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not all(
+        isinstance(data.get(field, []), list) for field in ('add', 'remove')
+    ):
+        return jsonify({'error': 'Se espera {"add": [ids], "remove": [ids]}'}), 400
+    try:
+        to_add = {int(i) for i in data.get('add', [])}
+        to_remove = {int(i) for i in data.get('remove', [])} - to_add
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Los ids deben ser números'}), 400
+    if len(to_add) + len(to_remove) > wishlist.MAX_BATCH:
+        return jsonify({'error': f'Máximo {wishlist.MAX_BATCH} productos por petición'}), 400
     
-    db.session.delete(wishlist_item)
-    db.session.commit()
+    removed = wishlist.remove(current_user.id, sorted(to_remove))
+    added = wishlist.add(current_user.id, sorted(to_add))
     
-    return jsonify({'message': 'Producto eliminado de tu lista de deseos'})
\ No newline at end of file
+    return jsonify({
+        'added': sorted(added),
+        'removed': sorted(removed),
+        'items': sorted(wishlist.product_ids(current_user.id))
+    })
\ No newline at end of file
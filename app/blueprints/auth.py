@@ -1,12 +1,24 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, make_response
 from flask_login import login_user, logout_user, login_required, current_user
-from werkzeug.security import check_password_hash
-from werkzeug.urls import url_parse
+from flask_mail import Message
+from models import db, User
+from extensions import mail
+from passwords import PasswordServiceBusy
+import throttle
+from urllib.parse import urlsplit
 import secrets
 from datetime import datetime, timedelta
 
 bp = Blueprint('auth', __name__)
 
+def _throttled(template, retry_after):
+    """429 response for throttled login/reset attempts"""
+    minutes = max(1, (retry_after + 59) // 60)
+    flash(f'Demasiados intentos. Inténtalo de nuevo en {minutes} minuto(s)', 'error')
+    response = make_response(render_template(template), 429)
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
 @bp.route('/login', methods=['GET', 'POST'])
 def login():
     """User login"""
@@ -14,21 +26,39 @@ def login():
         return redirect(url_for('main.index'))
     
     if request.method == 'POST':
-        from models import User
-        
         email = request.form.get('email')
         password = request.form.get('password')
         remember = request.form.get('remember', False)
+        ip = throttle.client_ip()
+        
+        # Reject locked-out IPs/emails before any DB lookup or hashing
+        wait = throttle.retry_after('login', ip, email)
+        if wait:
+            return _throttled('auth/login.html', wait)
         
         user = User.query.filter_by(email=email).first()
         
-        if user and user.check_password(password):
+        try:
+            valid = user is not None and user.check_password(password)
+        except PasswordServiceBusy:
+            flash('Demasiados intentos en este momento, inténtalo de nuevo en unos segundos', 'error')
+            return render_template('auth/login.html'), 503
+        
+        if valid:
+            # Upgrade hashes stored with an older algorithm or cost
+            if user.password_needs_rehash:
+                user.set_password(password)
+                db.session.commit()
+            throttle.reset('login', email)
             login_user(user, remember=remember)
             next_page = request.args.get('next')
-            if not next_page or url_parse(next_page).netloc != '':
+            if not next_page or urlsplit(next_page).netloc != '':
                 next_page = url_for('main.index')
             return redirect(next_page)
         else:
+            locked_for = throttle.record('login', ip, email)
+            if locked_for:
+                return _throttled('auth/login.html', locked_for)
             flash('Email o contraseña incorrectos', 'error')
     
     return render_template('auth/login.html')
@@ -40,9 +70,6 @@ def register():
         return redirect(url_for('main.index'))
     
     if request.method == 'POST':
-        from models import User
-        from app import db
-        
         email = request.form.get('email')
         password = request.form.get('password')
         confirm_password = request.form.get('confirm_password')
@@ -93,11 +120,16 @@ def forgot_password():
         return redirect(url_for('main.index'))
     
     if request.method == 'POST':
-        from models import User
-        from app import db, mail
-        from flask_mail import Message
-        
         email = request.form.get('email')
+        ip = throttle.client_ip()
+        
+        # Every reset request counts: each one sends an email
+        wait = throttle.retry_after('forgot_password', ip, email)
+        if not wait:
+            wait = throttle.record('forgot_password', ip, email)
+        if wait:
+            return _throttled('auth/forgot_password.html', wait)
+        
         user = User.query.filter_by(email=email).first()
         
         if user:
@@ -132,9 +164,6 @@ def reset_password(token):
     if current_user.is_authenticated:
         return redirect(url_for('main.index'))
     
-    from models import User
-    from app import db
-    
     user = User.query.filter_by(reset_token=token).first()
     
     if not user or not user.reset_token_expires or user.reset_token_expires < datetime.utcnow():
@@ -173,8 +202,6 @@ def profile():
 @login_required
 def update_profile():
     """Update user profile"""
-    from app import db
-    
     current_user.first_name = request.form.get('first_name')
     current_user.last_name = request.form.get('last_name')
     current_user.phone = request.form.get('phone')
@@ -1,5 +1,11 @@
 from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for, flash
 from flask_login import login_required, current_user
+from models import db, Product, Order, OrderItem
+from metrics import CHECKOUTS
+from order_numbers import next_order_number
+import idempotency
+import payments
+import orders
 
 bp = Blueprint('cart', __name__)
 
@@ -14,8 +20,6 @@ def view_cart():
 @bp.route('/add/<int:product_id>', methods=['POST'])
 def add_to_cart(product_id):
     """Add product to cart"""
-    from app.models import Product
-    
     product = Product.query.get_or_404(product_id)
     quantity = int(request.form.get('quantity', 1))
     
@@ -34,14 +38,15 @@ def add_to_cart(product_id):
         }
     
     session['cart'] = cart
-    flash(f'{product.name} agregado al carrito', 'success')
     
     if request.is_json:
+        # The client shows its own notification; a flash would sit in the session
         return jsonify({
             'message': 'Producto agregado al carrito',
             'cart_count': len(cart)
         })
     
+    flash(f'{product.name} agregado al carrito', 'success')
     return redirect(url_for('products.detail', product_id=product_id))
 
 @bp.route('/update/<product_key>', methods=['POST'])
@@ -121,27 +126,55 @@ def checkout_payment():
     tax = total * 0.08  # 8% tax
     final_total = total + shipping_cost + tax
     
+    # Sent back as a hidden field so a repeated "pay" POST is recognised
     return render_template('cart/checkout_payment.html', 
                          cart=cart, 
                          total=total,
                          shipping_cost=shipping_cost,
                          tax=tax,
-                         final_total=final_total)
+                         final_total=final_total,
+                         idempotency_key=idempotency.issue())
 
 @bp.route('/checkout/process', methods=['POST'])
 @login_required
 def process_checkout():
-    """Process the order"""
-    from app.models import Order, OrderItem
-    from app import db
-    import uuid
+    """Process the order, once per idempotency key"""
+    key = request.form.get('idempotency_key')
+    if key:
+        claimed = idempotency.claim('checkout', current_user.id, key)
+        if claimed is None:
+            flash('Tu pedido se está procesando, espera un momento', 'info')
+            return redirect(url_for('cart.view_cart'))
+        if claimed is not idempotency.Claimed:
+            # Repeat of a finished submission: show the order it created
+            return redirect(url_for('cart.order_confirmation', order_id=int(claimed)))
+    
+    try:
+        order = _place_order()
+    except Exception:
+        if key:
+            idempotency.release('checkout', current_user.id, key)
+        raise
+    if order is None:
+        if key:
+            idempotency.release('checkout', current_user.id, key)
+        flash('Error en el proceso de compra', 'error')
+        return redirect(url_for('cart.view_cart'))
+    if key:
+        idempotency.complete('checkout', current_user.id, key, order.id)
+    # The intent is created by the worker; the confirmation page polls for it
+    payments.request_intent(order.id)
     
+    flash(f'Pedido #{order.order_number} creado exitosamente', 'success')
+    return redirect(url_for('cart.order_confirmation', order_id=order.id))
+
+def _place_order():
+    """Create the order from the session cart; None if there is nothing to order"""
     cart = session.get('cart', {})
     shipping = session.get('shipping', {})
     
     if not cart or not shipping:
-        flash('Error en el proceso de compra', 'error')
-        return redirect(url_for('cart.view_cart'))
+        return None
     
     # Calculate totals
     subtotal = sum(item['price'] * item['quantity'] for item in cart.values())
@@ -152,7 +185,7 @@ def process_checkout():
     # Create order
     order = Order(
         user_id=current_user.id,
-        order_number=str(uuid.uuid4())[:8].upper(),
+        order_number=next_order_number(),
         subtotal=subtotal,
         shipping_cost=shipping_cost,
         tax=tax,
@@ -177,21 +210,20 @@ def process_checkout():
         )
         db.session.add(order_item)
     
+    orders.record_created(order, actor=current_user)
     db.session.commit()
+    CHECKOUTS.inc()
     
     # Clear cart and shipping info
     session['cart'] = {}
     session.pop('shipping', None)
     
-    flash(f'Pedido #{order.order_number} creado exitosamente', 'success')
-    return redirect(url_for('cart.order_confirmation', order_id=order.id))
+    return order
 
 @bp.route('/order/<int:order_id>')
 @login_required
 def order_confirmation(order_id):
     """Order confirmation page"""
-    from app.models import Order
-    
     order = Order.query.filter_by(id=order_id, user_id=current_user.id).first_or_404()
     
     return render_template('cart/order_confirmation.html', order=order)
\ No newline at end of file
@@ -1,22 +1,25 @@
 from flask import Blueprint, render_template, request, jsonify, session, flash, redirect, url_for
 from flask_login import login_required, current_user
+from models import Product
+import read_models
+import refdata
+from http_cache import public_when_anonymous
 
 bp = Blueprint('main', __name__)
 
 @bp.route('/')
+@public_when_anonymous()
 def index():
     """Home page with hero banner and featured products"""
-    from models import Product, Category
-    
     # Get featured products
-    featured_products = Product.query.filter_by(featured=True).limit(8).all()
+    featured_products = read_models.cards(
+        read_models.card_select(Product.featured == True).limit(8)
+    )
     
     # Get main categories
-    categories = Category.query.filter_by(parent_id=None).all()
-    
     return render_template('main/index.html', 
                          featured_products=featured_products,
-                         categories=categories)
+                         categories=refdata.categories().roots)
 
 @bp.route('/about')
 def about():
@@ -44,6 +47,7 @@ def privacy():
     return render_template('main/privacy.html')
 
 @bp.route('/search')
+@public_when_anonymous()
 def search():
     """Search functionality"""
     query = request.args.get('q', '')
@@ -52,12 +56,12 @@ def search():
     if not query:
         return redirect(url_for('products.catalog'))
     
-    from models import Product
-    products = Product.query.filter(
-        Product.name.contains(query) | 
-        Product.description.contains(query)
-    ).paginate(
-        page=page, per_page=12, error_out=False
+    products = read_models.paginate_cards(
+        read_models.card_select(
+            Product.name.contains(query) | 
+            Product.description.contains(query)
+        ).order_by(Product.name),
+        page=page, per_page=12
     )
     
     return render_template('main/search_results.html', 
@@ -0,0 +1,35 @@
+from flask import Blueprint, jsonify, request, abort, current_app
+from flask_login import login_required, current_user
+from models import Order
+import payments
+
+bp = Blueprint('payments', __name__)
+
+@bp.route('/webhook/<provider_name>', methods=['POST'])
+def webhook(provider_name):
+    """Provider webhook: verify, dedupe and queue; processing happens in the worker"""
+    if provider_name != payments.provider().name:
+        abort(404)
+    try:
+        event, duplicate = payments.accept_webhook(request.get_data(), request.headers)
+    except payments.WebhookError as e:
+        current_app.logger.warning('Rejected payment webhook: %s', e)
+        return jsonify({'error': 'invalid webhook'}), 400
+    except Exception:
+        current_app.logger.exception('Could not queue payment webhook')
+        # The provider retries on 5xx
+        return jsonify({'error': 'try again'}), 503
+    return jsonify({'received': event.id, 'duplicate': duplicate})
+
+@bp.route('/orders/<int:order_id>')
+@login_required
+def order_payment(order_id):
+    """Payment state for the confirmation page to poll until the intent exists"""
+    order = Order.query.filter_by(id=order_id, user_id=current_user.id).first_or_404()
+    return jsonify({
+        'order_number': order.order_number,
+        'payment_status': order.payment_status,
+        'provider': payments.provider().name,
+        'client_secret': payments.intent_for(order.id),
+        'publishable_key': current_app.config.get('STRIPE_PUBLISHABLE_KEY'),
+    })
@@ -1,40 +1,51 @@
 from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for, flash
 from flask_login import login_required, current_user
+from sqlalchemy import false
+from sqlalchemy.orm import selectinload
+from models import db, Product, Material, Review
+from http_cache import public_when_anonymous
 import secrets
+import read_models
+import refdata
+import recommendations
+import pricing
 
 bp = Blueprint('products', __name__)
 
 @bp.route('/catalog')
+@public_when_anonymous()
 def catalog():
     """Product catalog with filtering"""
     page = request.args.get('page', 1, type=int)
-    category_id = request.args.get('category')
+    category_id = request.args.get('category', type=int)
     brand = request.args.get('brand')
     material = request.args.get('material')
     min_price = request.args.get('min_price', type=float)
     max_price = request.args.get('max_price', type=float)
     sort_by = request.args.get('sort', 'name')
     
-    from models import Product, Category, Brand
+    # Base query: card columns only, see read_models.py
+    query = read_models.card_select(Product.active == True)
     
-    # Base query
-    query = Product.query.filter_by(active=True)
-    
-    # Apply filters
+    # Apply filters; names resolve to ids through the reference data, no joins
+    ref = refdata.snapshot()
     if category_id:
-        query = query.filter_by(category_id=category_id)
+        # The category and everything below it, in one indexed IN (...)
+        query = query.where(Product.category_id.in_(ref.categories.descendant_ids(category_id) or [category_id]))
     
     if brand:
-        query = query.join(Brand).filter(Brand.name == brand)
+        brand_ref = ref.brand_named(brand)
+        query = query.where(Product.brand_id == brand_ref.id if brand_ref else false())
     
     if material:
-        query = query.filter(Product.materials.any(name=material))
+        material_ref = ref.material_named(material)
+        query = query.where(Product.materials.any(Material.id == material_ref.id) if material_ref else false())
     
     if min_price:
-        query = query.filter(Product.price >= min_price)
+        query = query.where(Product.price >= min_price)
     
     if max_price:
-        query = query.filter(Product.price <= max_price)
+        query = query.where(Product.price <= max_price)
     
     # Apply sorting
     if sort_by == 'price_asc':
@@ -46,19 +57,14 @@ def catalog():
     else:
         query = query.order_by(Product.name.asc())
     
-    products = query.paginate(page=page, per_page=12, error_out=False)
-    
-    # Get filter options
-    categories = Category.query.all()
-    brands = Brand.query.all()
-    from models import Material
-    materials = Material.query.all()
+    products = read_models.paginate_cards(query, page=page, per_page=12)
     
     return render_template('products/catalog.html',
                          products=products,
-                         categories=categories,
-                         brands=brands,
-                         materials=materials,
+                         categories=ref.categories.ordered(),
+                         breadcrumbs=ref.categories.ancestors(category_id),
+                         brands=ref.brands,
+                         materials=ref.materials,
                          current_filters={
                              'category_id': category_id,
                              'brand': brand,
@@ -69,75 +75,97 @@ def catalog():
                          })
 
 @bp.route('/<int:product_id>')
+@public_when_anonymous()
 def detail(product_id):
     """Product detail page"""
-    from models import Product, Review
-    
-    product = Product.query.get_or_404(product_id)
+    product = db.get_or_404(Product, product_id, options=[selectinload(Product.materials)])
     reviews = Review.query.filter_by(product_id=product_id, approved=True).order_by(Review.created_at.desc()).limit(10).all()
-    related_products = Product.query.filter(
-        Product.category_id == product.category_id,
-        Product.id != product.id,
-        Product.active == True
-    ).limit(4).all()
+    related_products = recommendations.related_products(product, limit=4)
     
     return render_template('products/detail.html',
                          product=product,
+                         breadcrumbs=refdata.breadcrumbs(product.category_id),
                          reviews=reviews,
                          related_products=related_products)
 
 @bp.route('/custom-case')
 def custom_case():
     """Custom case designer"""
-    from models import Material, CaseType
-    
-    materials = Material.query.filter_by(available_for_custom=True).all()
-    case_types = CaseType.query.all()
+    ref = refdata.snapshot()
     
     return render_template('products/custom_case.html',
-                         materials=materials,
-                         case_types=case_types)
+                         materials=ref.custom_materials(),
+                         case_types=ref.case_types)
+
+@bp.route('/custom-case/price-model')
+def custom_case_price_model():
+    """Cacheable pricing model so the designer can quote without round trips"""
+    model = pricing.price_model()
+    response = jsonify(model)
+    response.set_etag(model['version'])
+    response.cache_control.public = True
+    response.cache_control.max_age = 300
+    return response.make_conditional(request)
 
 @bp.route('/calculate-custom-price', methods=['POST'])
 def calculate_custom_price():
     """Calculate price for custom case"""
-    data = request.get_json()
-    
-    width = float(data.get('width', 0))
-    height = float(data.get('height', 0))
-    depth = float(data.get('depth', 0))
-    material_id = data.get('material_id')
-    case_type_id = data.get('case_type_id')
-    extra_pockets = int(data.get('extra_pockets', 0))
-    
-    from models import Material, CaseType
-    
-    material = Material.query.get(material_id)
-    case_type = CaseType.query.get(case_type_id)
-    
-    if not material or not case_type:
-        return jsonify({'error': 'Material o tipo de funda inválido'}), 400
-    
-    # Calculate base price
-    volume = width * height * depth / 1000  # Convert to liters
-    base_price = volume * material.price_per_unit * case_type.price_multiplier
-    
-    # Add extras
-    pocket_price = extra_pockets * 15.0  # $15 per extra pocket
-    
-    total_price = base_price + pocket_price
+    data = request.get_json() or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Datos inválidos'}), 400
+    
+    try:
+        price = pricing.quote(
+            data.get('width', 0),
+            data.get('height', 0),
+            data.get('depth', 0),
+            data.get('material_id'),
+            data.get('case_type_id'),
+            data.get('extra_pockets', 0)
+        )
+    except pricing.QuoteError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(pricing.as_json(price))
+
+@bp.route('/calculate-custom-price/batch', methods=['POST'])
+def calculate_custom_price_batch():
+    """Quote many custom case combinations in one call (price grids)
+    
+    Accepts either {"quotes": [{width, height, depth, material_id, case_type_id,
+    extra_pockets}, ...]} or {"grid": {widths, heights, depths, material_ids,
+    case_type_ids, extra_pockets}} for every combination of the lists.
+    """
+    data = request.get_json() or {}
+    
+    try:
+        if 'grid' in data:
+            grid = data['grid']
+            version, results = pricing.quote_grid(
+                grid.get('widths', []),
+                grid.get('heights', []),
+                grid.get('depths', []),
+                grid.get('material_ids', []),
+                grid.get('case_type_ids', []),
+                grid.get('extra_pockets', 0)
+            )
+        else:
+            version, results = pricing.quote_many(data.get('quotes', []))
+    except (pricing.QuoteError, AttributeError, TypeError) as e:
+        message = str(e) if isinstance(e, pricing.QuoteError) else 'Datos inválidos'
+        return jsonify({'error': message}), 400
     
     return jsonify({
-        'base_price': round(base_price, 2),
-        'pocket_price': round(pocket_price, 2),
-        'total_price': round(total_price, 2),
-        'volume': round(volume, 2)
+        'version': version,
+        'quotes': [pricing.as_json(result) for result in results]
     })
 
 @bp.route('/add-custom-to-cart', methods=['POST'])
 def add_custom_to_cart():
     """Add custom case to cart"""
-    data = request.get_json()
+    data = request.get_json() or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Datos inválidos'}), 400
     
     # Validate data
     required_fields = ['width', 'height', 'depth', 'material_id', 'case_type_id']
@@ -145,17 +173,34 @@ def add_custom_to_cart():
         return jsonify({'error': 'Datos incompletos'}), 400
     
     # Calculate price
-    price_data = calculate_custom_price()
-    if price_data.status_code != 200:
-        return price_data
-    
-    price_info = price_data.get_json()
+    try:
+        price = pricing.quote(
+            data['width'],
+            data['height'],
+            data['depth'],
+            data['material_id'],
+            data['case_type_id'],
+            data.get('extra_pockets', 0)
+        )
+    except pricing.QuoteError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # The client prices locally from the published model; never charge a
+    # different price than the one it displayed
+    quoted_price = data.get('quoted_price')
+    if quoted_price is not None and not pricing.matches_quote(quoted_price, price):
+        return jsonify({
+            'error': 'El precio ha cambiado, revisa el nuevo total',
+            'price_changed': True,
+            'price_model_version': pricing.price_table().version,
+            'quote': pricing.as_json(price)
+        }), 409
     
     # Create custom product data
     custom_product = {
         'id': 'custom_' + secrets.token_urlsafe(8),
         'name': 'Funda Personalizada',
-        'price': price_info['total_price'],
+        'price': float(price['total_price']),
         'image': '/static/images/custom-case-placeholder.jpg',
         'custom_specs': {
             'width': data['width'],
@@ -180,9 +225,6 @@ def add_custom_to_cart():
 @login_required
 def add_review(product_id):
     """Add product review"""
-    from models import Review, Product
-    from models import db
-    
     product = Product.query.get_or_404(product_id)
     
     # Check if user already reviewed this product
@@ -0,0 +1,54 @@
+"""Flask extension instances shared by the app factory and the blueprints
+
+Nothing here touches the network at import time: the Redis client is created
+on first use in each process, so importing the app (or forking a gunicorn
+worker) never opens a connection.
+"""
+import os
+import threading
+
+import redis
+from celery import Celery
+from flask_login import LoginManager
+from flask_mail import Mail
+from flask_migrate import Migrate
+
+migrate = Migrate()
+login_manager = LoginManager()
+mail = Mail()
+celery = Celery('rickbags')
+
+
+class LazyRedis:
+    """Redis client built from REDIS_URL on first use, once per process"""
+
+    def __init__(self):
+        self.url = 'redis://localhost:6379/0'
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.url = app.config['REDIS_URL']
+        app.extensions['redis'] = self
+
+    @property
+    def client(self):
+        # A forked worker must not share the parent's sockets
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    self._client = redis.from_url(self.url)
+                    self._pid = os.getpid()
+        return self._client
+
+    def reset(self):
+        """Forget the client so the next call connects afresh"""
+        self._client = None
+        self._pid = None
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+redis_client = LazyRedis()
@@ -0,0 +1,165 @@
+"""Equipment fit matching
+
+Product and EquipmentProfile dimensions are stored as free-form JSON. This
+module normalises them into numeric width/height/depth columns (in cm) so
+"cases that fit my amp" is a GiST-indexed cube containment query instead of
+deserialising every product's JSON in Python.
+"""
+import math
+import re
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import Float, and_, case, cast, event, func, literal, nulls_last, or_, select
+from sqlalchemy.dialects.postgresql import JSONB, array
+
+from models import EquipmentProfile, Product, db
+
+DEFAULT_TOLERANCE_CM = 3.0
+MAX_TOLERANCE_CM = 20.0
+
+UNIT_FACTORS = {
+    'cm': 1.0,
+    'mm': 0.1,
+    'm': 100.0,
+    'in': 2.54,
+    'inch': 2.54,
+    'inches': 2.54,
+    '"': 2.54,
+}
+
+AXIS_KEYS = {
+    'width': ('width', 'w', 'ancho'),
+    'height': ('height', 'h', 'alto'),
+    'depth': ('depth', 'd', 'length', 'profundidad', 'fondo'),
+}
+
+_NUMBER = re.compile(r'^\s*([0-9]+(?:[.,][0-9]+)?)\s*([a-z"]*)\s*$', re.IGNORECASE)
+
+
+def _to_cm(value, default_unit):
+    if isinstance(value, (int, float)):
+        number, unit = float(value), default_unit
+    elif isinstance(value, str):
+        match = _NUMBER.match(value)
+        if not match:
+            return None
+        number = float(match.group(1).replace(',', '.'))
+        unit = match.group(2).lower() or default_unit
+    else:
+        return None
+    factor = UNIT_FACTORS.get(unit)
+    if factor is None or number <= 0:
+        return None
+    return round(number * factor, 2)
+
+
+def normalize_dimensions(dimensions):
+    """Return (width, height, depth) in cm, or None if any axis is missing
+
+    Accepts {width, height, depth} with numbers (cm), strings such as "68 cm"
+    or "26.5in", and an optional 'unit' key applying to bare numbers.
+    """
+    if not isinstance(dimensions, dict):
+        return None
+    default_unit = str(dimensions.get('unit', 'cm')).lower()
+    lowered = {str(k).lower(): v for k, v in dimensions.items()}
+    result = []
+    for axis in ('width', 'height', 'depth'):
+        value = next((lowered[k] for k in AXIS_KEYS[axis] if k in lowered), None)
+        cm = _to_cm(value, default_unit)
+        if cm is None:
+            return None
+        result.append(cm)
+    return tuple(result)
+
+
+def sync_dimensions(target):
+    """Copy target.dimensions into its numeric width/height/depth columns"""
+    normalized = normalize_dimensions(target.dimensions)
+    target.width_cm, target.height_cm, target.depth_cm = normalized or (None, None, None)
+
+
+def _before_flush(mapper, connection, target):
+    sync_dimensions(target)
+
+
+for _model in (Product, EquipmentProfile):
+    event.listen(_model, 'before_insert', _before_flush)
+    event.listen(_model, 'before_update', _before_flush)
+
+
+def _point(width, height, depth):
+    return func.cube(array([literal(width, Float), literal(height, Float), literal(depth, Float)]))
+
+
+# cube() rejects arrays with NULLs, so PRODUCT_BOX is only evaluated behind
+# HAS_DIMENSIONS (also the predicate of the partial ix_products_fit_box)
+HAS_DIMENSIONS = and_(Product.width_cm.isnot(None), Product.height_cm.isnot(None),
+                      Product.depth_cm.isnot(None))
+PRODUCT_BOX = func.cube(array([Product.width_cm, Product.height_cm, Product.depth_cm]))
+
+
+def products_fitting(width, height, depth, tolerance=DEFAULT_TOLERANCE_CM, limit=20,
+                     compatible_with=None):
+    """Active products whose inner dimensions fit the equipment within tolerance
+
+    A product fits when every axis is at least the equipment size and at most
+    `tolerance` cm larger. Results come closest-fit first via the GiST index.
+    `compatible_with` (e.g. "Marshall JCM800 2203") also includes products that
+    list that model in their compatibility, regardless of dimensions.
+    """
+    tolerance = float(tolerance)
+    if not math.isfinite(tolerance):
+        raise ValueError(f'Invalid tolerance: {tolerance}')
+    tolerance = min(max(tolerance, 0.0), MAX_TOLERANCE_CM)
+    box = func.cube(
+        array([literal(width, Float), literal(height, Float), literal(depth, Float)]),
+        array([literal(width + tolerance, Float), literal(height + tolerance, Float),
+               literal(depth + tolerance, Float)])
+    )
+    fits = and_(HAS_DIMENSIONS, PRODUCT_BOX.op('<@')(box))
+    distance = PRODUCT_BOX.op('<->')(_point(width, height, depth))
+    if compatible_with:
+        fits = or_(fits, cast(Product.compatibility, JSONB).contains([compatible_with]))
+        # Compatible products without dimensions have no distance; list them after the fits
+        distance = nulls_last(case((HAS_DIMENSIONS, distance)))
+
+    return Product.query.filter(
+        Product.active == True,
+        fits
+    ).order_by(distance).limit(limit).all()
+
+
+def products_fitting_profile(profile, tolerance=DEFAULT_TOLERANCE_CM, limit=20):
+    """products_fitting() for a saved EquipmentProfile; [] if it has no dimensions"""
+    if profile.width_cm is None:
+        return []
+    model_name = ' '.join(part for part in (profile.brand, profile.model) if part) or None
+    return products_fitting(profile.width_cm, profile.height_cm, profile.depth_cm,
+                            tolerance=tolerance, limit=limit, compatible_with=model_name)
+
+
+@click.command('normalize-dimensions')
+@with_appcontext
+def normalize_command():
+    """Backfill numeric dimension columns from the JSON dimensions"""
+    for model in (Product, EquipmentProfile):
+        updated = 0
+        last_id = 0
+        while True:
+            rows = db.session.execute(
+                select(model).where(model.id > last_id).order_by(model.id).limit(1000)
+            ).scalars().all()
+            if not rows:
+                break
+            for row in rows:
+                sync_dimensions(row)
+            updated += len(rows)
+            last_id = rows[-1].id
+            db.session.commit()
+        click.echo(f'{model.__tablename__}: normalised {updated} rows')
+
+
+def init_app(app):
+    app.cli.add_command(normalize_command)
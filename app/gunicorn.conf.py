@@ -0,0 +1,87 @@
+"""Gunicorn configuration for RickBags
+
+GUNICORN_PROFILE selects the worker model:
+
+- sync:    one request per process (workers = 2 * CPUs + 1)
+- gthread: a few threads per process for requests that wait on Postgres,
+           Redis or SMTP (workers = CPUs + 1, threads = 4)  [default]
+- gevent:  cooperative greenlets, many concurrent I/O-bound requests per
+           process (workers = CPUs + 1, worker_connections = 100)
+
+The app is preloaded in the master and forked, so workers share its memory
+copy-on-write; post_fork drops the connections they would otherwise inherit.
+"""
+import gc
+import multiprocessing
+import os
+import shutil
+
+PROFILE = os.environ.get('GUNICORN_PROFILE', 'gthread')
+if PROFILE not in ('sync', 'gthread', 'gevent'):
+    raise ValueError(f'Unknown GUNICORN_PROFILE {PROFILE!r}')
+
+if PROFILE == 'gevent':
+    # Must run before the app (and psycopg2/redis/smtplib) is imported by preload
+    from gevent import monkey
+    monkey.patch_all()
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+
+cpus = multiprocessing.cpu_count()
+
+bind = '0.0.0.0:8000'
+worker_class = PROFILE
+workers = int(os.environ.get('GUNICORN_WORKERS', 2 * cpus + 1 if PROFILE == 'sync' else cpus + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4 if PROFILE == 'gthread' else 1))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then; with preload a respawn is just a fork
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = max_requests // 10
+
+
+def on_starting(server):
+    """Start every deploy with an empty multiprocess metrics directory and
+    fingerprinted assets (./app is bind-mounted over the image's build)"""
+    metrics_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir, exist_ok=True)
+
+    import assets
+    try:
+        assets.build()
+    except OSError:
+        server.log.exception('Asset build failed; serving the previous manifest')
+
+
+def pre_fork(server, worker):
+    """Move the preloaded app out of the GC's reach so collections in the
+    workers don't touch (and copy) the shared pages"""
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """Drop database and Redis connections inherited from the master"""
+    if not server.cfg.preload_app:
+        return
+    from wsgi import app
+    from extensions import redis_client
+    from models import db
+    import order_numbers
+
+    with app.app_context():
+        # close=False: leave the parent's sockets alone, just forget them here
+        db.engine.dispose(close=False)
+    redis_client.reset()
+    order_numbers.reset()
+
+
+def child_exit(server, worker):
+    """Drop live gauges of a dead worker from the aggregated metrics"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
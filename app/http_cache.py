@@ -0,0 +1,126 @@
+"""HTTP caching headers for view responses
+
+nginx micro-caches anonymous GETs (see nginx/nginx.conf). The app decides what
+is cacheable: pages marked with public_when_anonymous are public only for
+visitors without a login, cart or flash messages; everything a personalised
+visitor sees is private, no-store.
+
+Public pages still send Vary: Cookie for browsers and any other shared cache,
+but nginx ignores it (proxy_ignore_headers Vary): it keeps visitors with a
+session out of the cache itself, and keying on the whole Cookie header would
+give every anonymous visitor with an analytics cookie their own entry.
+"""
+import logging
+import threading
+from functools import wraps
+
+import requests
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+
+logger = logging.getLogger(__name__)
+
+
+def _public(response, max_age, shared_max_age=None, stale_while_revalidate=None):
+    directives = ['public', f'max-age={max_age}']
+    if shared_max_age is not None:
+        directives.append(f's-maxage={shared_max_age}')
+    if stale_while_revalidate:
+        directives.append(f'stale-while-revalidate={stale_while_revalidate}')
+    response.headers['Cache-Control'] = ', '.join(directives)
+
+
+def _private(response):
+    response.headers['Cache-Control'] = 'private, no-store'
+
+
+def is_personalized():
+    """Whether the response may depend on who is asking"""
+    cookies = request.cookies
+    return (
+        current_user.is_authenticated
+        or bool(session)
+        or session.modified
+        or current_app.config['SESSION_COOKIE_NAME'] in cookies
+        or current_app.config.get('REMEMBER_COOKIE_NAME', 'remember_token') in cookies
+    )
+
+
+def _cacheable(response):
+    return request.method in ('GET', 'HEAD') and response.status_code == 200
+
+
+def cache_control(max_age, stale_while_revalidate=None):
+    """Mark a view's successful GET responses as publicly cacheable
+
+    For responses that never depend on the visitor. They get an ETag too, so
+    a client revalidating after max-age gets a 304 instead of the body.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            response = make_response(view(*args, **kwargs))
+            if not _cacheable(response):
+                return response
+            _public(response, max_age, stale_while_revalidate=stale_while_revalidate)
+            response.add_etag()
+            return response.make_conditional(request)
+        return wrapped
+    return decorator
+
+
+def public_when_anonymous(max_age=0, shared_max_age=10, stale_while_revalidate=30):
+    """Let nginx micro-cache a page for anonymous visitors
+
+    Browsers get max_age, nginx keeps the page shared_max_age seconds and may
+    serve it stale while one request refreshes it. Vary: Cookie keeps caches
+    other than nginx from serving the anonymous entry to logged-in visitors.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            response = make_response(view(*args, **kwargs))
+            response.vary.add('Cookie')
+            if not _cacheable(response) or is_personalized():
+                _private(response)
+            else:
+                _public(response, max_age, shared_max_age, stale_while_revalidate)
+            return response
+        return wrapped
+    return decorator
+
+
+def _mark_private(response):
+    # Views without an explicit policy are never shared once a visitor has state
+    if 'Cache-Control' not in response.headers and request.endpoint != 'static' and is_personalized():
+        _private(response)
+    return response
+
+
+def _refresh(base_url, headers, paths):
+    for path in paths:
+        try:
+            requests.get(base_url + path, headers=headers, timeout=10)
+        except requests.RequestException:
+            logger.warning('Cache refresh of %s failed', path, exc_info=True)
+
+
+def refresh(paths):
+    """Re-fetch pages through nginx's internal refresh listener in the background
+
+    Open-source nginx has no purge; the listener bypasses the cache for every
+    request and stores the fresh response under the same key. The public host
+    and scheme are sent along, so the page's absolute URLs and the cache key
+    match what visitors get.
+    """
+    config = current_app.config
+    base_url = config.get('CACHE_REFRESH_URL')
+    if not base_url:
+        return
+    headers = {'Host': config['CACHE_REFRESH_HOST'], 'X-Forwarded-Proto': config['CACHE_REFRESH_SCHEME']}
+    threading.Thread(target=_refresh, args=(base_url.rstrip('/'), headers, list(paths)), daemon=True).start()
+
+
+def init_app(app):
+    """Mark personalised responses private unless a view set a policy"""
+    app.after_request(_mark_private)
@@ -0,0 +1,77 @@
+"""Idempotency keys for non-repeatable POSTs
+
+A form carries a key issued when the page was rendered. The first submission
+claims it with SET NX and later stores its result under the same key; a
+repeat (double click, proxy retry) gets that result back instead of running
+the action again. Redis errors fail open: the request runs without dedupe.
+"""
+import logging
+import secrets
+import time
+
+import redis
+
+from extensions import redis_client
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'rickbags:idempotency:'
+PENDING = b'-'
+PENDING_TTL = 60  # An in-flight claim that outlives this was lost with its worker
+RESULT_TTL = 86400
+WAIT_STEP = 0.1
+
+
+class Claimed:
+    """Sentinel for a fresh claim: the caller runs the action"""
+
+
+def issue():
+    """A new key to embed in a form"""
+    return secrets.token_urlsafe(16)
+
+
+def _key(scope, owner, key):
+    return f'{KEY_PREFIX}{scope}:{owner}:{key}'
+
+
+def claim(scope, owner, key, wait=3.0):
+    """Claim `key` for `owner`
+
+    Returns Claimed if the caller should run the action (also when Redis is
+    down), the stored result if the action already finished, or None if it is
+    still running elsewhere after `wait` seconds.
+    """
+    name = _key(scope, owner, key)
+    deadline = time.monotonic() + wait
+    try:
+        while True:
+            if redis_client.set(name, PENDING, nx=True, ex=PENDING_TTL):
+                return Claimed
+            value = redis_client.get(name)
+            if value is None:
+                continue  # expired between SET and GET; try to claim again
+            if value != PENDING:
+                return value.decode()
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(WAIT_STEP)
+    except redis.RedisError:
+        logger.warning('Idempotency claim failed; running without dedupe', exc_info=True)
+        return Claimed
+
+
+def complete(scope, owner, key, result):
+    """Store the result that repeats of `key` will receive"""
+    try:
+        redis_client.set(_key(scope, owner, key), str(result), ex=RESULT_TTL)
+    except redis.RedisError:
+        logger.warning('Could not store idempotency result for %s', key, exc_info=True)
+
+
+def release(scope, owner, key):
+    """Drop a claim whose action failed so the user can retry"""
+    try:
+        redis_client.delete(_key(scope, owner, key))
+    except redis.RedisError:
+        logger.warning('Could not release idempotency key %s', key, exc_info=True)
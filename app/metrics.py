@@ -0,0 +1,161 @@
+"""Prometheus metrics for RickBags
+
+Gunicorn pre-forks several workers, so every metric here is written through
+prometheus_client's multiprocess mode when PROMETHEUS_MULTIPROC_DIR is set.
+The /metrics view then aggregates the per-worker files into a single scrape.
+"""
+import os
+import time
+
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+
+# Latency buckets tuned for a storefront: most pages should land well under 250ms
+LATENCY_BUCKETS = (.005, .01, .025, .05, .075, .1, .25, .5, .75, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    'rickbags_request_duration_seconds',
+    'Request latency by blueprint endpoint',
+    ['endpoint', 'method', 'status'],
+    buckets=LATENCY_BUCKETS
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'rickbags_requests_in_flight',
+    'Requests currently being handled',
+    multiprocess_mode='livesum'
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    'rickbags_db_pool_checked_out',
+    'Database connections currently checked out of the pool',
+    multiprocess_mode='livesum'
+)
+DB_POOL_CONNECTIONS = Gauge(
+    'rickbags_db_pool_connections',
+    'Database connections currently open',
+    multiprocess_mode='livesum'
+)
+SESSION_LATENCY = Histogram(
+    'rickbags_session_duration_seconds',
+    'Redis session read/write latency',
+    ['operation'],
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25)
+)
+CACHE_REQUESTS = Counter(
+    'rickbags_cache_requests_total',
+    'Cache lookups by cache name and result',
+    ['cache', 'result']
+)
+CHECKOUTS = Counter(
+    'rickbags_checkouts_total',
+    'Orders created through the checkout'
+)
+THROTTLED_REQUESTS = Counter(
+    'rickbags_throttled_requests_total',
+    'Login/password-reset attempts rejected by throttling',
+    ['scope', 'kind']
+)
+LOCKOUTS = Counter(
+    'rickbags_throttle_lockouts_total',
+    'Lockouts started by login/password-reset throttling',
+    ['scope', 'kind']
+)
+
+
+def record_cache(cache, hit):
+    """Count a cache lookup so hit ratios can be derived per cache"""
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+class _TimedSessionInterface:
+    """Wraps the configured session interface to time Redis reads and writes"""
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    def open_session(self, app, request):
+        with SESSION_LATENCY.labels('read').time():
+            return self.inner.open_session(app, request)
+
+    def save_session(self, app, session, response):
+        with SESSION_LATENCY.labels('write').time():
+            return self.inner.save_session(app, session, response)
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_POOL_CHECKED_OUT.inc()
+
+
+def _on_checkin(dbapi_connection, connection_record):
+    DB_POOL_CHECKED_OUT.dec()
+
+
+def _on_connect(dbapi_connection, connection_record):
+    DB_POOL_CONNECTIONS.inc()
+
+
+def _on_close(dbapi_connection, connection_record):
+    DB_POOL_CONNECTIONS.dec()
+
+
+def _before_request():
+    g._metrics_start = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc()
+
+
+def _after_request(response):
+    g._metrics_status = response.status_code
+    return response
+
+
+def _teardown_request(exc):
+    start = g.pop('_metrics_start', None)
+    if start is None:
+        return
+    REQUESTS_IN_FLIGHT.dec()
+    # Unmatched URLs share one label so scanners can't blow up cardinality
+    endpoint = request.endpoint or 'unmatched'
+    if endpoint == 'metrics':
+        return
+    status = g.pop('_metrics_status', 500)
+    REQUEST_LATENCY.labels(endpoint, request.method, str(status)).observe(
+        time.perf_counter() - start
+    )
+
+
+def metrics_view():
+    """Expose metrics aggregated across all gunicorn workers"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_app(app):
+    """Register request instrumentation and the /metrics endpoint"""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.session_interface = _TimedSessionInterface(app.session_interface)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+
+    if not event.contains(Pool, 'checkout', _on_checkout):
+        event.listen(Pool, 'checkout', _on_checkout)
+        event.listen(Pool, 'checkin', _on_checkin)
+        event.listen(Pool, 'connect', _on_connect)
+        event.listen(Pool, 'close', _on_close)
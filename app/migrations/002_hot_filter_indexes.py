@@ -0,0 +1,52 @@
+"""Indexes for hot filter predicates
+
+Revision ID: 002
+Revises: 001
+Create Date: 2024-05-20 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+# (name, table, columns, partial predicate)
+# wishlist(user_id) is already served by the (user_id, product_id) unique constraint.
+INDEXES = [
+    # Catalog: active products by category, default name ordering
+    ('ix_products_active_category_name', 'products', ['category_id', 'name'], 'active'),
+    # Catalog without a category filter: name / price / newest ordering and price ranges
+    ('ix_products_active_name', 'products', ['name'], 'active'),
+    ('ix_products_active_price', 'products', ['price'], 'active'),
+    ('ix_products_active_created_at', 'products', ['created_at'], 'active'),
+    # Home page featured products: only a handful of rows are featured
+    ('ix_products_featured', 'products', ['id'], 'featured'),
+    # Product detail reviews and rating aggregates
+    ('ix_reviews_product_approved_created_at', 'reviews', ['product_id', 'approved', 'created_at'], None),
+    ('ix_order_items_order_id', 'order_items', ['order_id'], None),
+    ('ix_order_items_product_id', 'order_items', ['product_id'], None),
+    ('ix_orders_created_at', 'orders', ['created_at'], None),
+    ('ix_product_materials_material_id', 'product_materials', ['material_id'], None),
+    # Password reset lookups only ever target users with a pending token
+    ('ix_users_reset_token', 'users', ['reset_token'], 'reset_token IS NOT NULL'),
+]
+
+def upgrade():
+    # CONCURRENTLY keeps the tables writable while large indexes build
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name, table, columns, unique=False,
+                postgresql_where=sa.text(where) if where else None,
+                postgresql_concurrently=True,
+                if_not_exists=True
+            )
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
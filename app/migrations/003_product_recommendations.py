@@ -0,0 +1,29 @@
+"""Product recommendations
+
+Revision ID: 003
+Revises: 002
+Create Date: 2024-06-03 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('product_recommendations',
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('rank', sa.SmallInteger(), nullable=False),
+        sa.Column('related_product_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['related_product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('product_id', 'rank')
+    )
+
+def downgrade():
+    op.drop_table('product_recommendations')
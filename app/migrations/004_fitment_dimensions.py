@@ -0,0 +1,57 @@
+"""Numeric dimensions and fit indexes
+
+Revision ID: 004
+Revises: 003
+Create Date: 2024-06-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+NUMERIC = r"'^\s*[0-9]+(\.[0-9]+)?\s*$'"
+
+def _backfill(table):
+    # Plain numbers in cm; `flask normalize-dimensions` handles units and strings
+    op.execute(f"""
+        UPDATE {table} SET
+            width_cm = (dimensions->>'width')::float,
+            height_cm = (dimensions->>'height')::float,
+            depth_cm = (dimensions->>'depth')::float
+        WHERE dimensions->>'width' ~ {NUMERIC}
+          AND dimensions->>'height' ~ {NUMERIC}
+          AND dimensions->>'depth' ~ {NUMERIC}
+    """)
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS cube')
+    
+    for table in ('products', 'equipment_profiles'):
+        op.add_column(table, sa.Column('width_cm', sa.Float(), nullable=True))
+        op.add_column(table, sa.Column('height_cm', sa.Float(), nullable=True))
+        op.add_column(table, sa.Column('depth_cm', sa.Float(), nullable=True))
+        _backfill(table)
+    
+    op.execute("""
+        CREATE INDEX ix_products_fit_box ON products
+        USING gist (cube(array[width_cm, height_cm, depth_cm]))
+        WHERE active
+          AND width_cm IS NOT NULL AND height_cm IS NOT NULL AND depth_cm IS NOT NULL
+    """)
+    op.execute("""
+        CREATE INDEX ix_products_compatibility ON products
+        USING gin ((compatibility::jsonb))
+    """)
+
+def downgrade():
+    op.drop_index('ix_products_compatibility', table_name='products')
+    op.drop_index('ix_products_fit_box', table_name='products')
+    for table in ('equipment_profiles', 'products'):
+        op.drop_column(table, 'depth_cm')
+        op.drop_column(table, 'height_cm')
+        op.drop_column(table, 'width_cm')
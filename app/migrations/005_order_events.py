@@ -0,0 +1,43 @@
+"""Order status events
+
+Revision ID: 005
+Revises: 004
+Create Date: 2024-07-01 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('order_events',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=False),
+        sa.Column('from_status', sa.String(length=20), nullable=True),
+        sa.Column('to_status', sa.String(length=20), nullable=False),
+        sa.Column('actor_id', sa.Integer(), nullable=True),
+        sa.Column('note', sa.Text(), nullable=True),
+        sa.Column('data', postgresql.JSONB(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['actor_id'], ['users.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_order_events_order_created_at', 'order_events', ['order_id', 'created_at'])
+    
+    # Seed the history with each order's current state
+    op.execute("""
+        INSERT INTO order_events (order_id, from_status, to_status, created_at)
+        SELECT id, NULL, COALESCE(status, 'pending'), COALESCE(updated_at, created_at, now())
+        FROM orders
+    """)
+
+def downgrade():
+    op.drop_index('ix_order_events_order_created_at', table_name='order_events')
+    op.drop_table('order_events')
@@ -0,0 +1,37 @@
+"""Denormalised product rating aggregates
+
+Revision ID: 006
+Revises: 005
+Create Date: 2024-07-08 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('products', sa.Column('rating_average', sa.Numeric(3, 2), nullable=False, server_default='0'))
+    op.add_column('products', sa.Column('rating_count', sa.Integer(), nullable=False, server_default='0'))
+    
+    # Kept current by moderation.refresh_ratings() when reviews are moderated
+    op.execute("""
+        UPDATE products p SET
+            rating_average = r.average,
+            rating_count = r.count
+        FROM (
+            SELECT product_id, ROUND(AVG(rating), 2) AS average, COUNT(*) AS count
+            FROM reviews
+            WHERE approved
+            GROUP BY product_id
+        ) r
+        WHERE p.id = r.product_id
+    """)
+
+def downgrade():
+    op.drop_column('products', 'rating_count')
+    op.drop_column('products', 'rating_average')
@@ -0,0 +1,21 @@
+"""Order number sequence
+
+Revision ID: 007
+Revises: 006
+Create Date: 2024-07-15 10:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # INCREMENT must match models.order_number_seq: each nextval() reserves a block
+    op.execute('CREATE SEQUENCE order_number_seq START WITH 1 INCREMENT BY 64')
+
+def downgrade():
+    op.execute('DROP SEQUENCE order_number_seq')
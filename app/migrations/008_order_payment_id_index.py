@@ -0,0 +1,23 @@
+"""Index orders by payment intent
+
+Revision ID: 008
+Revises: 007
+Create Date: 2024-07-22 10:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Webhooks look orders up by the provider's intent id
+    with op.get_context().autocommit_block():
+        op.create_index('ix_orders_payment_id', 'orders', ['payment_id'], postgresql_concurrently=True)
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_orders_payment_id', table_name='orders', postgresql_concurrently=True)
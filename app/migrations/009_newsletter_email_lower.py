@@ -0,0 +1,43 @@
+"""Case-insensitive unique newsletter emails
+
+Revision ID: 009
+Revises: 008
+Create Date: 2024-07-29 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Collapse case-insensitive duplicates onto the oldest row, active if any copy was
+    op.execute("""
+        WITH ranked AS (
+            SELECT id,
+                   bool_or(active) OVER w AS any_active,
+                   row_number() OVER (w ORDER BY created_at NULLS LAST, id) AS rank
+            FROM newsletter_subscribers
+            WINDOW w AS (PARTITION BY lower(trim(email)))
+        )
+        UPDATE newsletter_subscribers s SET active = r.any_active
+        FROM ranked r
+        WHERE s.id = r.id AND r.rank = 1 AND s.active IS DISTINCT FROM r.any_active
+    """)
+    op.execute("""
+        DELETE FROM newsletter_subscribers s
+        USING newsletter_subscribers keep
+        WHERE lower(trim(s.email)) = lower(trim(keep.email))
+          AND (COALESCE(keep.created_at, 'infinity'), keep.id)
+            < (COALESCE(s.created_at, 'infinity'), s.id)
+    """)
+    op.execute("UPDATE newsletter_subscribers SET email = lower(trim(email)) WHERE email <> lower(trim(email))")
+    op.create_index('ux_newsletter_subscribers_email_lower', 'newsletter_subscribers',
+                    [sa.text('lower(email)')], unique=True)
+
+def downgrade():
+    op.drop_index('ux_newsletter_subscribers_email_lower', table_name='newsletter_subscribers')
@@ -1,16 +1,17 @@
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy import Table, Column, Integer, ForeignKey
+from passwords import passwords
+from sqlalchemy import Column, Integer, ForeignKey, cast, func
+from sqlalchemy.dialects.postgresql import JSONB, array
 
 # Create db instance
 db = SQLAlchemy()
 
 # Association tables for many-to-many relationships
-product_materials = Table('product_materials',
+product_materials = db.Table('product_materials',
     Column('product_id', Integer, ForeignKey('products.id'), primary_key=True),
-    Column('material_id', Integer, ForeignKey('materials.id'), primary_key=True)
+    Column('material_id', Integer, ForeignKey('materials.id'), primary_key=True, index=True)
 )
 
 class User(UserMixin, db.Model):
@@ -29,6 +30,10 @@ class User(UserMixin, db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_users_reset_token', 'reset_token', postgresql_where=db.text('reset_token IS NOT NULL')),
+    )
+    
     # Relationships
     orders = db.relationship('Order', backref='user', lazy='dynamic')
     reviews = db.relationship('Review', backref='user', lazy='dynamic')
@@ -36,10 +41,14 @@ class User(UserMixin, db.Model):
     equipment_profiles = db.relationship('EquipmentProfile', backref='user', lazy='dynamic')
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = passwords.hash(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return passwords.verify(self.password_hash, password)
+    
+    @property
+    def password_needs_rehash(self):
+        return passwords.needs_rehash(self.password_hash)
     
     @property
     def full_name(self):
@@ -128,6 +137,10 @@ class Product(db.Model):
     weight = db.Column(db.Numeric(8, 2))  # In grams
     dimensions = db.Column(db.JSON)  # {width, height, depth} in cm
     compatibility = db.Column(db.JSON)  # Compatible amplifier models
+    # Numeric copy of `dimensions` kept in sync by fitment.py for indexed fit queries
+    width_cm = db.Column(db.Float)
+    height_cm = db.Column(db.Float)
+    depth_cm = db.Column(db.Float)
     main_image = db.Column(db.String(200))
     images = db.Column(db.JSON)  # Array of image URLs
     features = db.Column(db.JSON)  # Array of product features
@@ -136,6 +149,9 @@ class Product(db.Model):
     seo_description = db.Column(db.String(300))
     active = db.Column(db.Boolean, default=True)
     featured = db.Column(db.Boolean, default=False)
+    # Approved-review aggregates, refreshed per moderation batch by moderation.refresh_ratings()
+    rating_average = db.Column(db.Numeric(3, 2), nullable=False, default=0, server_default='0')
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # Foreign keys
     category_id = db.Column(db.Integer, ForeignKey('categories.id'), nullable=False)
@@ -145,22 +161,35 @@ class Product(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Partial indexes for the catalog/home filters (see migration 002)
+    __table_args__ = (
+        db.Index('ix_products_active_category_name', 'category_id', 'name', postgresql_where=db.text('active')),
+        db.Index('ix_products_active_name', 'name', postgresql_where=db.text('active')),
+        db.Index('ix_products_active_price', 'price', postgresql_where=db.text('active')),
+        db.Index('ix_products_active_created_at', 'created_at', postgresql_where=db.text('active')),
+        db.Index('ix_products_featured', 'id', postgresql_where=db.text('featured')),
+        # Requires the cube extension (db/init.sql, migration 004); cube() rejects NULLs
+        db.Index('ix_products_fit_box', func.cube(array([width_cm, height_cm, depth_cm])),
+                 postgresql_using='gist',
+                 postgresql_where=db.text('active AND width_cm IS NOT NULL '
+                                          'AND height_cm IS NOT NULL AND depth_cm IS NOT NULL')),
+        db.Index('ix_products_compatibility', cast(compatibility, JSONB), postgresql_using='gin'),
+    )
+    
     # Relationships
-    materials = db.relationship('Material', secondary=product_materials, lazy='subquery')
+    # Loaded on access; the detail page asks for them with selectinload
+    materials = db.relationship('Material', secondary=product_materials, lazy='select')
     reviews = db.relationship('Review', backref='product', lazy='dynamic')
     order_items = db.relationship('OrderItem', backref='product', lazy='dynamic')
     wishlist_items = db.relationship('Wishlist', backref='product', lazy='dynamic')
     
     @property
     def average_rating(self):
-        reviews = self.reviews.filter_by(approved=True).all()
-        if not reviews:
-            return 0
-        return sum(review.rating for review in reviews) / len(reviews)
+        return float(self.rating_average or 0)
     
     @property
     def review_count(self):
-        return self.reviews.filter_by(approved=True).count()
+        return self.rating_count or 0
     
     @property
     def is_in_stock(self):
@@ -175,6 +204,21 @@ class Product(db.Model):
     def __repr__(self):
         return f'<Product {self.name}>'
 
+class ProductRecommendation(db.Model):
+    __tablename__ = 'product_recommendations'
+    
+    # Precomputed by recommendations.rebuild(); (product_id, rank) is the lookup key
+    product_id = db.Column(db.Integer, ForeignKey('products.id', ondelete='CASCADE'), primary_key=True)
+    rank = db.Column(db.SmallInteger, primary_key=True)
+    related_product_id = db.Column(db.Integer, ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    
+    def __repr__(self):
+        return f'<ProductRecommendation {self.product_id} #{self.rank} -> {self.related_product_id}>'
+
+# Steps by a block per nextval(); order_numbers.py hands out the block in memory
+order_number_seq = db.Sequence('order_number_seq', start=1, increment=64, metadata=db.metadata)
+
 class Order(db.Model):
     __tablename__ = 'orders'
     
@@ -201,20 +245,22 @@ class Order(db.Model):
     
     # Payment information
     payment_method = db.Column(db.String(50))
-    payment_id = db.Column(db.String(100))  # Stripe/PayPal transaction ID
+    payment_id = db.Column(db.String(100), index=True)  # Stripe/PayPal transaction ID
     
     # Notes
     customer_notes = db.Column(db.Text)
     admin_notes = db.Column(db.Text)
     
     # Timestamps
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     shipped_at = db.Column(db.DateTime)
     delivered_at = db.Column(db.DateTime)
     
     # Relationships
     items = db.relationship('OrderItem', backref='order', lazy='dynamic', cascade='all, delete-orphan')
+    events = db.relationship('OrderEvent', backref='order', lazy='dynamic',
+                             order_by='OrderEvent.created_at', cascade='all, delete-orphan')
     
     @property
     def item_count(self):
@@ -227,8 +273,8 @@ class OrderItem(db.Model):
     __tablename__ = 'order_items'
     
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, ForeignKey('orders.id'), nullable=False)
-    product_id = db.Column(db.Integer, ForeignKey('products.id'))  # Nullable for custom products
+    order_id = db.Column(db.Integer, ForeignKey('orders.id'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, ForeignKey('products.id'), index=True)  # Nullable for custom products
     
     # Product snapshot (in case product changes after order)
     product_name = db.Column(db.String(200), nullable=False)
@@ -248,6 +294,28 @@ class OrderItem(db.Model):
     def __repr__(self):
         return f'<OrderItem {self.product_name}>'
 
+class OrderEvent(db.Model):
+    __tablename__ = 'order_events'
+    
+    # Append-only status history; written by orders.transition()
+    id = db.Column(db.BigInteger, primary_key=True)
+    order_id = db.Column(db.Integer, ForeignKey('orders.id', ondelete='CASCADE'), nullable=False)
+    from_status = db.Column(db.String(20))
+    to_status = db.Column(db.String(20), nullable=False)
+    actor_id = db.Column(db.Integer, ForeignKey('users.id', ondelete='SET NULL'))
+    note = db.Column(db.Text)
+    data = db.Column(JSONB)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    actor = db.relationship('User')
+    
+    __table_args__ = (
+        db.Index('ix_order_events_order_created_at', 'order_id', 'created_at'),
+    )
+    
+    def __repr__(self):
+        return f'<OrderEvent {self.order_id} {self.from_status} -> {self.to_status}>'
+
 class Review(db.Model):
     __tablename__ = 'reviews'
     
@@ -263,6 +331,10 @@ class Review(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_reviews_product_approved_created_at', 'product_id', 'approved', 'created_at'),
+    )
+    
     def __repr__(self):
         return f'<Review {self.rating} stars for {self.product.name}>'
 
@@ -291,6 +363,9 @@ class EquipmentProfile(db.Model):
     brand = db.Column(db.String(100))
     model = db.Column(db.String(100))
     dimensions = db.Column(db.JSON)  # {width, height, depth} in cm
+    width_cm = db.Column(db.Float)
+    height_cm = db.Column(db.Float)
+    depth_cm = db.Column(db.Float)
     notes = db.Column(db.Text)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -307,6 +382,11 @@ class NewsletterSubscriber(db.Model):
     active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Conflict target of the signup upsert and bulk import (see newsletter.py)
+    __table_args__ = (
+        db.Index('ux_newsletter_subscribers_email_lower', func.lower(email), unique=True),
+    )
+    
     def __repr__(self):
         return f'<NewsletterSubscriber {self.email}>'
 
@@ -0,0 +1,60 @@
+"""Review moderation
+
+Approving or rejecting reviews is set-based: one UPDATE/DELETE over the whole
+selection returns the affected products, and their rating aggregates
+(Product.rating_average / rating_count) are recomputed once per batch.
+"""
+from datetime import datetime
+
+from sqlalchemy import Integer, any_, delete, func, literal, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from models import Product, Review, db
+
+
+def _ids(ids):
+    return any_(literal(list(ids), ARRAY(Integer)))
+
+
+def refresh_ratings(product_ids=None):
+    """Recompute approved-review aggregates for `product_ids` (all products if None)"""
+    approved = (Review.product_id == Product.id, Review.approved.is_(True))
+    stmt = update(Product).values(
+        rating_average=select(func.coalesce(func.round(func.avg(Review.rating), 2), 0))
+        .where(*approved).scalar_subquery(),
+        rating_count=select(func.count()).where(*approved).scalar_subquery()
+    )
+    if product_ids is not None:
+        if not product_ids:
+            return
+        stmt = stmt.where(Product.id == _ids(product_ids))
+    db.session.execute(stmt, execution_options={'synchronize_session': False})
+
+
+def approve(review_ids):
+    """Approve pending reviews; returns (reviews approved, ids of the products affected)"""
+    if not review_ids:
+        return 0, set()
+    rows = db.session.execute(
+        update(Review).where(Review.id == _ids(review_ids), Review.approved.is_(False))
+        .values(approved=True, updated_at=datetime.utcnow())
+        .returning(Review.product_id),
+        execution_options={'synchronize_session': False}
+    ).scalars().all()
+    product_ids = set(rows)
+    refresh_ratings(product_ids)
+    return len(rows), product_ids
+
+
+def reject(review_ids):
+    """Delete reviews; returns (reviews deleted, ids of the products whose ratings changed)"""
+    if not review_ids:
+        return 0, set()
+    rows = db.session.execute(
+        delete(Review).where(Review.id == _ids(review_ids))
+        .returning(Review.product_id, Review.approved),
+        execution_options={'synchronize_session': False}
+    ).all()
+    product_ids = {product_id for product_id, was_approved in rows if was_approved}
+    refresh_ratings(product_ids)
+    return len(rows), product_ids
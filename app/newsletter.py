@@ -0,0 +1,117 @@
+"""Newsletter subscriptions
+
+Emails are stored lower-cased and are unique on lower(email) (migration 009),
+so a signup is one INSERT ... ON CONFLICT upsert with no race between check
+and insert. Bulk imports stream a CSV, normalise and dedupe it in memory, COPY
+the result into a temporary staging table and merge it with one
+INSERT ... SELECT ... ON CONFLICT DO NOTHING.
+"""
+import csv
+import io
+import re
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, literal_column, text
+from sqlalchemy.dialects.postgresql import insert
+
+from models import NewsletterSubscriber, db
+
+EMAIL_RE = re.compile(r'^[^@\s\\]+@[^@\s\\]+\.[^@\s\\]+$')
+MAX_LENGTH = 120
+
+
+def normalize(email):
+    """Lower-cased, trimmed email, or None if it is not a plausible address"""
+    email = (email or '').strip().lower()
+    if len(email) > MAX_LENGTH or not EMAIL_RE.match(email):
+        return None
+    return email
+
+
+def subscribe(email):
+    """Subscribe or reactivate; returns 'subscribed', 'reactivated' or 'exists'"""
+    row = db.session.execute(
+        insert(NewsletterSubscriber).values(email=email, active=True, created_at=datetime.utcnow())
+        .on_conflict_do_update(
+            index_elements=[func.lower(NewsletterSubscriber.email)],
+            set_={'active': True},
+            where=NewsletterSubscriber.active.is_not(True)
+        )
+        # xmax is 0 only for a freshly inserted row version
+        .returning(literal_column('xmax = 0'))
+    ).first()
+    db.session.commit()
+    if row is None:
+        return 'exists'
+    return 'subscribed' if row[0] else 'reactivated'
+
+
+def _emails(rows):
+    """Email column of CSV rows: the 'email' header if present, else the first column"""
+    column = 0
+    for index, row in enumerate(rows):
+        if not row:
+            continue
+        if index == 0:
+            header = [cell.strip().lower() for cell in row]
+            if 'email' in header:
+                column = header.index('email')
+                continue
+        yield row[column] if column < len(row) else ''
+
+
+def import_csv(stream):
+    """Import emails from a binary CSV stream; returns counters"""
+    stats = {'rows': 0, 'invalid': 0, 'duplicates': 0, 'imported': 0, 'existing': 0}
+    seen = set()
+    buffer = io.StringIO()
+    reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace', newline=''))
+    for raw in _emails(reader):
+        stats['rows'] += 1
+        email = normalize(raw)
+        if email is None:
+            stats['invalid'] += 1
+        elif email in seen:
+            stats['duplicates'] += 1
+        else:
+            seen.add(email)
+            buffer.write(email)
+            buffer.write('\n')
+    if not seen:
+        return stats
+
+    db.session.execute(text(
+        'CREATE TEMP TABLE newsletter_import (email varchar(120)) ON COMMIT DROP'
+    ))
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert('COPY newsletter_import (email) FROM STDIN', buffer)
+    finally:
+        cursor.close()
+    # Unsubscribed addresses stay unsubscribed: an import never reactivates
+    result = db.session.execute(text("""
+        INSERT INTO newsletter_subscribers (email, active, created_at)
+        SELECT email, true, now() AT TIME ZONE 'utc' FROM newsletter_import
+        ON CONFLICT ((lower(email))) DO NOTHING
+    """))
+    stats['imported'] = result.rowcount
+    db.session.commit()
+    stats['existing'] = len(seen) - stats['imported']
+    return stats
+
+
+@click.command('import-newsletter')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@with_appcontext
+def import_command(path):
+    """Import newsletter subscribers from a CSV file"""
+    with open(path, 'rb') as f:
+        stats = import_csv(f)
+    click.echo(', '.join(f'{name}: {count}' for name, count in stats.items()))
+
+
+def init_app(app):
+    app.cli.add_command(import_command)
@@ -0,0 +1,110 @@
+"""Order numbers
+
+Unique without retries: numbers come from the Postgres sequence
+`order_number_seq`, which steps by BLOCK_SIZE so each worker process reserves
+a block with one nextval() and hands out the rest from memory. The integer is
+then scrambled by a fixed bijection on 40 bits (so consecutive orders don't
+look consecutive) and written as 8 Crockford base32 symbols plus a check
+symbol, e.g. ``KBT2R0PZR``. Typos and swapped symbols fail verify().
+
+Never change MULTIPLIERS or SHIFT: that would make new numbers collide with
+old ones.
+"""
+import os
+import threading
+
+from models import db, order_number_seq
+
+BLOCK_SIZE = order_number_seq.increment
+
+BITS = 40
+MASK = (1 << BITS) - 1
+MULTIPLIERS = (0x9E3779B97F, 0xC2B2AE3D27)  # odd, so invertible mod 2**40
+SHIFT = 20
+
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+CHECK_ALPHABET = ALPHABET + '*~$=U'
+LENGTH = 8
+# Crockford decoding leniency for numbers read back by people
+_ALIASES = str.maketrans({'I': '1', 'L': '1', 'O': '0', '-': None, ' ': None})
+
+
+def _scramble(n):
+    n = (n * MULTIPLIERS[0]) & MASK
+    n ^= n >> SHIFT
+    return (n * MULTIPLIERS[1]) & MASK
+
+
+def _encode(n):
+    symbols = []
+    for _ in range(LENGTH):
+        n, digit = divmod(n, 32)
+        symbols.append(ALPHABET[digit])
+    return ''.join(reversed(symbols))
+
+
+def _decode(code):
+    n = 0
+    for symbol in code:
+        n = n * 32 + ALPHABET.index(symbol)
+    return n
+
+
+def format_number(n):
+    """Code for sequence value `n`"""
+    if not 0 < n <= MASK:
+        raise ValueError(f'Order sequence out of range: {n}')
+    value = _scramble(n)
+    return _encode(value) + CHECK_ALPHABET[value % 37]
+
+
+def normalize(code):
+    """Upper-case and fix look-alike symbols in a typed order number"""
+    return (code or '').upper().translate(_ALIASES)
+
+
+def verify(code):
+    """True if `code` is well formed and its check symbol matches"""
+    code = normalize(code)
+    if len(code) != LENGTH + 1 or any(c not in ALPHABET for c in code[:LENGTH]):
+        return False
+    return CHECK_ALPHABET[_decode(code[:LENGTH]) % 37] == code[LENGTH]
+
+
+class _Allocator:
+    """Hands out sequence values from a block reserved once per process"""
+
+    def __init__(self):
+        self._next = 0
+        self._end = 0
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def take(self):
+        with self._lock:
+            # A forked worker must not reuse the parent's block
+            if self._next >= self._end or self._pid != os.getpid():
+                start = db.session.execute(order_number_seq.next_value()).scalar()
+                self._next, self._end = start, start + BLOCK_SIZE
+                self._pid = os.getpid()
+            value = self._next
+            self._next += 1
+            return value
+
+    def reset(self):
+        with self._lock:
+            self._next = self._end = 0
+            self._pid = None
+
+
+_allocator = _Allocator()
+
+
+def next_order_number():
+    """A new, never issued order number"""
+    return format_number(_allocator.take())
+
+
+def reset():
+    """Forget the reserved block (after fork)"""
+    _allocator.reset()
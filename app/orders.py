@@ -0,0 +1,207 @@
+"""Order lifecycle
+
+A validated state machine over Order.status. Every transition appends an
+OrderEvent in the caller's transaction; once that transaction commits, the new
+event ids are handed to the task queue (emails, status rollups) in one batch,
+so a status change is a single write and nothing is sent for a rolled-back one.
+transition_many() does the same for a whole selection with one set-based UPDATE.
+"""
+import logging
+from datetime import datetime
+
+import redis
+from sqlalchemy import Integer, String, any_, event, func, insert, literal, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from extensions import celery, redis_client
+from models import Order, OrderEvent, db
+
+logger = logging.getLogger(__name__)
+
+STATES = ('pending', 'processing', 'shipped', 'delivered', 'cancelled')
+
+TRANSITIONS = {
+    'pending': ('processing', 'cancelled'),
+    'processing': ('shipped', 'cancelled'),
+    'shipped': ('delivered',),
+    'delivered': (),
+    'cancelled': (),
+}
+
+STATUS_LABELS = {
+    'pending': 'Pendiente',
+    'processing': 'En preparación',
+    'shipped': 'Enviado',
+    'delivered': 'Entregado',
+    'cancelled': 'Cancelado',
+}
+
+ROLLUP_KEY = 'rickbags:orders:rollup'
+
+
+class InvalidTransition(ValueError):
+    """Status change not allowed from the order's current state"""
+
+
+def allowed_transitions(status):
+    return TRANSITIONS.get(status or 'pending', ())
+
+
+def check_transition(current, target):
+    current = current or 'pending'
+    if target not in STATES:
+        raise InvalidTransition(f'Estado desconocido: {target}')
+    if target not in TRANSITIONS[current]:
+        raise InvalidTransition(
+            f'No se puede pasar de {STATUS_LABELS[current]} a {STATUS_LABELS[target]}'
+        )
+
+
+def _apply(order, target, now, tracking_number=None):
+    order.status = target
+    if target == 'shipped':
+        order.shipped_at = now
+        if tracking_number:
+            order.tracking_number = tracking_number
+    elif target == 'delivered':
+        order.delivered_at = now
+
+
+def _record(order, previous, target, now, actor=None, note=None, data=None):
+    order_event = OrderEvent(
+        order=order,
+        from_status=previous,
+        to_status=target,
+        actor_id=actor.id if actor is not None else None,
+        note=note,
+        data=data,
+        created_at=now
+    )
+    db.session.add(order_event)
+    _pending(db.session()).append(order_event)
+    return order_event
+
+
+def record_created(order, actor=None):
+    """Record a newly placed order; the caller commits"""
+    return _record(order, None, order.status or 'pending', datetime.utcnow(), actor)
+
+
+def transition(order, target, actor=None, tracking_number=None, note=None):
+    """Move one order to `target` and record the event; the caller commits"""
+    check_transition(order.status, target)
+    now = datetime.utcnow()
+    previous = order.status or 'pending'
+    _apply(order, target, now, tracking_number)
+    data = {'tracking_number': tracking_number} if tracking_number else None
+    return _record(order, previous, target, now, actor, note, data)
+
+
+def transition_many(order_ids, target, actor=None, note=None):
+    """Move every order that may go to `target` in one UPDATE; the caller commits
+
+    Orders whose current status does not allow the change are left alone.
+    Returns the ids that moved.
+    """
+    if target not in STATES:
+        raise InvalidTransition(f'Estado desconocido: {target}')
+    sources = [status for status, targets in TRANSITIONS.items() if target in targets]
+    if not sources or not order_ids:
+        return []
+    now = datetime.utcnow()
+    current = select(Order.id, func.coalesce(Order.status, 'pending').label('status')).where(
+        Order.id == any_(literal(list(order_ids), ARRAY(Integer))),
+        func.coalesce(Order.status, 'pending') == any_(literal(sources, ARRAY(String)))
+    ).with_for_update().cte('current')
+    values = {'status': target, 'updated_at': now}
+    if target == 'shipped':
+        values['shipped_at'] = now
+    elif target == 'delivered':
+        values['delivered_at'] = now
+    moved = db.session.execute(
+        update(Order).where(Order.id == current.c.id).values(**values)
+        .returning(Order.id, current.c.status),
+        execution_options={'synchronize_session': False}
+    ).all()
+    if not moved:
+        return []
+    actor_id = actor.id if actor is not None else None
+    event_ids = db.session.execute(insert(OrderEvent).returning(OrderEvent.id), [
+        {'order_id': order_id, 'from_status': previous, 'to_status': target,
+         'actor_id': actor_id, 'note': note, 'created_at': now}
+        for order_id, previous in moved
+    ]).scalars().all()
+    _pending_ids(db.session()).extend(event_ids)
+    return [order_id for order_id, _ in moved]
+
+
+# Fan-out after commit
+
+def _pending(session):
+    return session.info.setdefault('order_events', [])
+
+
+def _pending_ids(session):
+    return session.info.setdefault('order_event_ids', [])
+
+
+@event.listens_for(Session, 'before_commit')
+def _collect_event_ids(session):
+    events = session.info.pop('order_events', None)
+    if not events:
+        return
+    session.flush()
+    _pending_ids(session).extend(e.id for e in events)
+
+
+@event.listens_for(Session, 'after_commit')
+def _enqueue_events(session):
+    event_ids = session.info.pop('order_event_ids', None)
+    if event_ids:
+        enqueue(event_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_events(session):
+    session.info.pop('order_events', None)
+    session.info.pop('order_event_ids', None)
+
+
+def enqueue(event_ids):
+    """Queue notifications and rollups for committed events; never fails the request"""
+    try:
+        celery.send_task('tasks.order_events_committed', args=[list(event_ids)])
+    except Exception:
+        logger.exception('Could not enqueue order events %s', event_ids)
+
+
+# Rollups
+
+def refresh_rollup():
+    """Recompute per-status order counts and revenue into a Redis hash"""
+    rows = db.session.query(
+        Order.status, func.count(Order.id), func.coalesce(func.sum(Order.total), 0)
+    ).group_by(Order.status).all()
+    rollup = {'revenue': str(sum(total for _, _, total in rows))}
+    for status in STATES:
+        rollup[f'count:{status}'] = 0
+    for status, count, _ in rows:
+        rollup[f'count:{status or "pending"}'] = count
+    pipe = redis_client.pipeline()
+    pipe.delete(ROLLUP_KEY)
+    pipe.hset(ROLLUP_KEY, mapping=rollup)
+    pipe.execute()
+    return rollup
+
+
+def status_count(status):
+    """Orders in `status`, from the rollup when available"""
+    try:
+        value = redis_client.hget(ROLLUP_KEY, f'count:{status}')
+    except redis.RedisError:
+        logger.warning('Order rollup unavailable', exc_info=True)
+        value = None
+    if value is not None:
+        return int(value)
+    return Order.query.filter_by(status=status).count()
@@ -0,0 +1,166 @@
+"""Password hashing service
+
+Hashes with a configurable algorithm and cost (argon2id, bcrypt or scrypt),
+verifies every format the site has ever stored (including werkzeug's
+pbkdf2/scrypt defaults), and reports when a stored hash should be upgraded so
+logins can rehash transparently.
+
+Verification runs on a small bounded thread pool: a credential-stuffing burst
+is rejected with PasswordServiceBusy instead of queueing unbounded CPU work
+behind every gunicorn worker.
+"""
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import bcrypt
+from argon2 import PasswordHasher as Argon2Hasher
+from argon2.exceptions import InvalidHashError, VerificationError, VerifyMismatchError
+from werkzeug.security import check_password_hash, generate_password_hash
+
+ALGORITHMS = ('argon2id', 'bcrypt', 'scrypt')
+
+DEFAULTS = {
+    'PASSWORD_HASH_ALGORITHM': 'argon2id',
+    'ARGON2_TIME_COST': 3,
+    'ARGON2_MEMORY_COST': 65536,  # KiB
+    'ARGON2_PARALLELISM': 1,
+    'BCRYPT_LOG_ROUNDS': 12,
+    'SCRYPT_N': 2 ** 15,
+    'SCRYPT_R': 8,
+    'SCRYPT_P': 1,
+    'PASSWORD_VERIFY_THREADS': 2,
+    'PASSWORD_VERIFY_CONCURRENCY': 4,  # Running + waiting verifications per worker
+    'PASSWORD_VERIFY_TIMEOUT': 5.0,  # Seconds to wait for an admitted verification's result
+}
+
+_SCRYPT_PARAMS = re.compile(r'^scrypt:(\d+):(\d+):(\d+)\$')
+
+
+class PasswordServiceBusy(RuntimeError):
+    """Too many password verifications already in flight"""
+
+
+class PasswordService:
+    def __init__(self, app=None):
+        self.config = dict(DEFAULTS)
+        self._executor = None
+        self._executor_pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        for key, default in DEFAULTS.items():
+            app.config.setdefault(key, default)
+        self.configure(**{key: app.config[key] for key in DEFAULTS})
+        app.extensions['passwords'] = self
+
+    def configure(self, **options):
+        self.config.update(options)
+        if self.config['PASSWORD_HASH_ALGORITHM'] not in ALGORITHMS:
+            raise ValueError(f"Unknown password hash algorithm {self.config['PASSWORD_HASH_ALGORITHM']!r}")
+        self._argon2 = Argon2Hasher(
+            time_cost=int(self.config['ARGON2_TIME_COST']),
+            memory_cost=int(self.config['ARGON2_MEMORY_COST']),
+            parallelism=int(self.config['ARGON2_PARALLELISM'])
+        )
+        self._slots = threading.BoundedSemaphore(int(self.config['PASSWORD_VERIFY_CONCURRENCY']))
+
+    # Hashing
+
+    def hash(self, password):
+        algorithm = self.config['PASSWORD_HASH_ALGORITHM']
+        if algorithm == 'argon2id':
+            return self._argon2.hash(password)
+        if algorithm == 'bcrypt':
+            rounds = int(self.config['BCRYPT_LOG_ROUNDS'])
+            return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('ascii')
+        return generate_password_hash(password, method=self._scrypt_method())
+
+    def _scrypt_method(self):
+        return f"scrypt:{int(self.config['SCRYPT_N'])}:{int(self.config['SCRYPT_R'])}:{int(self.config['SCRYPT_P'])}"
+
+    def needs_rehash(self, password_hash):
+        """Whether a stored hash uses a different algorithm or cost than configured"""
+        algorithm = self.config['PASSWORD_HASH_ALGORITHM']
+        if algorithm == 'argon2id':
+            if not password_hash.startswith('$argon2id$'):
+                return True
+            try:
+                return self._argon2.check_needs_rehash(password_hash)
+            except InvalidHashError:
+                return True
+        if algorithm == 'bcrypt':
+            if not password_hash.startswith(('$2a$', '$2b$', '$2y$')):
+                return True
+            return int(password_hash.split('$')[2]) != int(self.config['BCRYPT_LOG_ROUNDS'])
+        match = _SCRYPT_PARAMS.match(password_hash)
+        return match is None or password_hash[:match.end() - 1] != self._scrypt_method()
+
+    # Verification
+
+    def _verify(self, password_hash, password):
+        if password_hash.startswith('$argon2'):
+            try:
+                return self._argon2.verify(password_hash, password)
+            except (VerifyMismatchError, VerificationError, InvalidHashError):
+                return False
+        if password_hash.startswith(('$2a$', '$2b$', '$2y$')):
+            try:
+                return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('ascii'))
+            except ValueError:
+                return False
+        # werkzeug formats: pbkdf2:sha256:..., scrypt:N:r:p
+        return check_password_hash(password_hash, password)
+
+    def _executor_class(self):
+        # Under gevent, patched threads are greenlets that would hash on the
+        # event loop; gevent's executor runs the work on native threads
+        try:
+            from gevent import monkey
+        except ImportError:
+            return ThreadPoolExecutor
+        if monkey.is_module_patched('threading'):
+            from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+            return NativeThreadPoolExecutor
+        return ThreadPoolExecutor
+
+    def _pool(self):
+        # Threads don't survive fork; build the pool lazily in each worker
+        if self._executor is None or self._executor_pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._executor_pid != os.getpid():
+                    self._executor = self._executor_class()(
+                        max_workers=int(self.config['PASSWORD_VERIFY_THREADS']),
+                        thread_name_prefix='password-verify'
+                    )
+                    self._executor_pid = os.getpid()
+                    self._slots = threading.BoundedSemaphore(int(self.config['PASSWORD_VERIFY_CONCURRENCY']))
+        return self._executor
+
+    def verify(self, password_hash, password):
+        """Check a password; raises PasswordServiceBusy when saturated"""
+        if not password_hash or password is None:
+            return False
+        pool = self._pool()
+        slots = self._slots
+        # Shed at once when saturated; waiting for a slot would queue the request thread
+        if not slots.acquire(blocking=False):
+            raise PasswordServiceBusy()
+        try:
+            future = pool.submit(self._verify, password_hash, password)
+        except RuntimeError:
+            slots.release()
+            raise
+        # The slot frees when the hash finishes, even if this request gave up on it
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=float(self.config['PASSWORD_VERIFY_TIMEOUT']))
+        except FutureTimeout:
+            raise PasswordServiceBusy()
+
+
+passwords = PasswordService()
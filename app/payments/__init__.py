@@ -0,0 +1,183 @@
+"""Payments
+
+Checkout never waits on the provider: once the order is committed,
+request_intent() queues a Celery task that creates the payment intent and
+caches its client secret in Redis, where the confirmation page polls for it.
+
+Provider webhooks are verified (signature and timestamp), deduplicated by
+event id with SET NX and handed to the queue, so a burst of deliveries costs
+the web workers one HMAC and two Redis round trips each. apply_event() then
+moves Order.payment_status with a guarded UPDATE, so redelivered or
+out-of-order events are no-ops. If processing finally fails, the worker drops
+the event's dedupe marker (forget_webhook) so the provider's next redelivery
+is processed instead of being acknowledged as a duplicate.
+"""
+import logging
+from datetime import datetime
+
+import click
+import redis
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import String, any_, func, literal, update
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from extensions import celery, redis_client
+from models import Order, db
+import orders
+from payments.base import Intent, PaymentError, PaymentProvider, WebhookError, WebhookEvent
+from payments.fake import FakeProvider
+from payments.stripe_provider import StripeProvider
+
+__all__ = ['Intent', 'PaymentError', 'PaymentProvider', 'WebhookError', 'WebhookEvent',
+           'FakeProvider', 'StripeProvider', 'init_app', 'provider', 'request_intent',
+           'create_intent', 'intent_for', 'accept_webhook', 'forget_webhook', 'apply_event']
+
+logger = logging.getLogger(__name__)
+
+INTENT_KEY = 'rickbags:payments:intent:'
+INTENT_TTL = 86400
+WEBHOOK_KEY = 'rickbags:payments:webhook:'
+WEBHOOK_TTL = 7 * 86400  # Outlives the provider's redelivery schedule
+
+# New payment status -> statuses it may replace
+PAYMENT_TRANSITIONS = {
+    'paid': ('pending', 'failed'),
+    'failed': ('pending',),
+    'refunded': ('paid',),
+}
+
+
+def provider():
+    return current_app.extensions['payments']
+
+
+def request_intent(order_id):
+    """Queue intent creation for a committed order; never fails the request"""
+    try:
+        celery.send_task('tasks.create_payment_intent', args=[order_id])
+    except Exception:
+        logger.exception('Could not enqueue payment intent for order %s', order_id)
+
+
+def create_intent(order_id):
+    """Create the provider intent for an order (runs in the worker)"""
+    order = db.session.get(Order, order_id)
+    if order is None or (order.payment_status or 'pending') != 'pending':
+        return None
+    intent = provider().create_intent(order, current_app.config['PAYMENT_CURRENCY'])
+    order.payment_id = intent.id
+    order.payment_method = provider().name
+    db.session.commit()
+    try:
+        redis_client.set(f'{INTENT_KEY}{order_id}', intent.client_secret, ex=INTENT_TTL)
+    except redis.RedisError:
+        logger.warning('Could not cache intent for order %s', order_id, exc_info=True)
+    return intent
+
+
+def intent_for(order_id):
+    """Client secret of the order's intent, or None while it is being created"""
+    try:
+        secret = redis_client.get(f'{INTENT_KEY}{order_id}')
+    except redis.RedisError:
+        logger.warning('Payment intent cache unavailable', exc_info=True)
+        return None
+    return secret.decode() if secret is not None else None
+
+
+def _webhook_key(provider_name, event_id):
+    return f'{WEBHOOK_KEY}{provider_name}:{event_id}'
+
+
+def accept_webhook(payload, headers):
+    """Verify and enqueue a delivery; returns (event, duplicate)
+
+    Raises WebhookError for deliveries that must be rejected.
+    """
+    event = provider().parse_webhook(payload, headers)
+    try:
+        if not redis_client.set(_webhook_key(event.provider, event.id), 1, nx=True, ex=WEBHOOK_TTL):
+            return event, True
+    except redis.RedisError:
+        # Processing is idempotent, so a missed dedupe only costs a no-op task
+        logger.warning('Webhook dedupe unavailable', exc_info=True)
+    try:
+        celery.send_task('tasks.process_payment_event', args=[event._asdict()])
+    except Exception:
+        forget_webhook(event._asdict())
+        raise
+    return event, False
+
+
+def forget_webhook(event):
+    """Drop an event's dedupe marker so a redelivery of it is processed again"""
+    try:
+        redis_client.delete(_webhook_key(event['provider'], event['id']))
+    except redis.RedisError:
+        logger.warning('Could not drop webhook marker for %s', event['id'], exc_info=True)
+
+
+def apply_event(event):
+    """Apply a webhook event to its order; returns the order id if it changed"""
+    new_status = event['payment_status']
+    sources = PAYMENT_TRANSITIONS.get(new_status)
+    if not sources or not event['intent_id']:
+        return None
+    order_id = db.session.execute(
+        update(Order).where(
+            Order.payment_id == event['intent_id'],
+            func.coalesce(Order.payment_status, 'pending') == any_(literal(list(sources), ARRAY(String)))
+        ).values(payment_status=new_status, updated_at=datetime.utcnow())
+        .returning(Order.id),
+        execution_options={'synchronize_session': False}
+    ).scalar()
+    if order_id is None:
+        return None
+    if new_status == 'paid':
+        order = db.session.get(Order, order_id)
+        if order.status == 'pending':
+            orders.transition(order, 'processing', note='Pago confirmado')
+    db.session.commit()
+    return order_id
+
+
+payments_cli = AppGroup('payments', help='Payment provider tools')
+
+
+@payments_cli.command('simulate')
+@click.argument('order_id', type=int)
+@click.argument('event_type', default='payment_intent.succeeded')
+def simulate_command(order_id, event_type):
+    """Deliver a signed fake webhook for an order (fake provider only)"""
+    fake = provider()
+    if not isinstance(fake, FakeProvider):
+        raise click.ClickException('PAYMENT_PROVIDER is not "fake"')
+    order = db.session.get(Order, order_id)
+    if order is None or not order.payment_id:
+        raise click.ClickException('Order not found or its intent is not created yet')
+    payload = fake.event_payload(order.payment_id, event_type)
+    response = current_app.test_client().post(
+        f'/payments/webhook/{fake.name}', data=payload, headers=fake.sign(payload),
+        content_type='application/json'
+    )
+    click.echo(f'{response.status_code} {response.get_data(as_text=True)}')
+
+
+def init_app(app):
+    config = app.config
+    config.setdefault('PAYMENT_PROVIDER', 'stripe' if config.get('STRIPE_SECRET_KEY') else 'fake')
+    config.setdefault('PAYMENT_CURRENCY', 'usd')
+    config.setdefault('PAYMENT_WEBHOOK_TOLERANCE', 300)
+    if config['PAYMENT_PROVIDER'] == 'stripe':
+        # Without these every intent or webhook would fail at request time
+        missing = [key for key in ('STRIPE_SECRET_KEY', 'STRIPE_WEBHOOK_SECRET') if not config.get(key)]
+        if missing:
+            raise RuntimeError(f"PAYMENT_PROVIDER is 'stripe' but {', '.join(missing)} is not set")
+        instance = StripeProvider(config['STRIPE_SECRET_KEY'], config.get('STRIPE_WEBHOOK_SECRET'),
+                                  tolerance=config['PAYMENT_WEBHOOK_TOLERANCE'])
+    else:
+        instance = FakeProvider(config.get('FAKE_PAYMENT_SECRET') or config['SECRET_KEY'],
+                                tolerance=config['PAYMENT_WEBHOOK_TOLERANCE'])
+    app.extensions['payments'] = instance
+    app.cli.add_command(payments_cli)
@@ -0,0 +1,48 @@
+"""Provider interface shared by the Stripe and fake implementations"""
+from decimal import ROUND_HALF_UP, Decimal
+from typing import NamedTuple, Optional
+
+# Provider event type (Stripe's names; the fake provider uses them too) -> Order.payment_status
+EVENT_STATUSES = {
+    'payment_intent.succeeded': 'paid',
+    'payment_intent.payment_failed': 'failed',
+    'charge.refunded': 'refunded',
+}
+
+
+class PaymentError(Exception):
+    """The provider could not be reached or refused the request"""
+
+
+class WebhookError(ValueError):
+    """A webhook delivery failed signature, timestamp or format checks"""
+
+
+class Intent(NamedTuple):
+    id: str
+    client_secret: str
+    status: str
+
+
+class WebhookEvent(NamedTuple):
+    id: str
+    provider: str
+    intent_id: str
+    payment_status: Optional[str]  # paid / failed / refunded, None if not relevant
+    created: int
+
+
+class PaymentProvider:
+    name = None
+
+    def create_intent(self, order, currency):
+        """Create (or fetch, if retried) the payment intent for `order`"""
+        raise NotImplementedError
+
+    def parse_webhook(self, payload, headers):
+        """Verify a raw webhook delivery and return a WebhookEvent"""
+        raise NotImplementedError
+
+
+def to_cents(amount):
+    return int((Decimal(str(amount)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
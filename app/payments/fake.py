@@ -0,0 +1,66 @@
+"""In-process stand-in for a payment provider
+
+Used in development and tests when no Stripe key is configured. Intents are
+created locally and webhooks are signed the way Stripe signs them
+(``t=<timestamp>,v1=<HMAC-SHA256 of "t.payload">``), so the webhook endpoint,
+replay protection and queue run exactly as in production. `flask payments
+simulate` delivers such a webhook for an order.
+"""
+import hashlib
+import hmac
+import json
+import time
+import uuid
+
+from payments.base import EVENT_STATUSES, Intent, PaymentProvider, WebhookError, WebhookEvent
+
+SIGNATURE_HEADER = 'Fake-Signature'
+
+
+class FakeProvider(PaymentProvider):
+    name = 'fake'
+
+    def __init__(self, webhook_secret, tolerance=300):
+        self.webhook_secret = webhook_secret
+        self.tolerance = tolerance
+
+    def create_intent(self, order, currency):
+        # Deterministic per order, like Stripe with an idempotency key
+        intent_id = f'fake_pi_{order.id}'
+        return Intent(intent_id, f'{intent_id}_secret_{uuid.uuid4().hex[:12]}', 'requires_payment_method')
+
+    def _signature(self, timestamp, payload):
+        message = f'{timestamp}.'.encode() + payload
+        return hmac.new(self.webhook_secret.encode(), message, hashlib.sha256).hexdigest()
+
+    def sign(self, payload, timestamp=None):
+        """Headers for delivering `payload` (bytes) to the webhook endpoint"""
+        timestamp = int(time.time()) if timestamp is None else timestamp
+        return {SIGNATURE_HEADER: f't={timestamp},v1={self._signature(timestamp, payload)}'}
+
+    def event_payload(self, intent_id, event_type):
+        """A webhook body for `intent_id` in Stripe's shape"""
+        return json.dumps({
+            'id': f'evt_{uuid.uuid4().hex}',
+            'type': event_type,
+            'created': int(time.time()),
+            'data': {'object': {'id': intent_id}},
+        }).encode()
+
+    def parse_webhook(self, payload, headers):
+        try:
+            fields = dict(part.split('=', 1) for part in headers.get(SIGNATURE_HEADER, '').split(','))
+            timestamp = int(fields['t'])
+            signature = fields['v1']
+        except (ValueError, KeyError):
+            raise WebhookError('Missing or malformed signature header')
+        if not hmac.compare_digest(signature, self._signature(timestamp, payload)):
+            raise WebhookError('Signature mismatch')
+        if abs(time.time() - timestamp) > self.tolerance:
+            raise WebhookError('Timestamp outside the tolerance window')
+        try:
+            event = json.loads(payload)
+            return WebhookEvent(event['id'], self.name, event['data']['object']['id'],
+                                EVENT_STATUSES.get(event['type']), event['created'])
+        except (ValueError, KeyError, TypeError) as e:
+            raise WebhookError(f'Malformed event: {e}') from e
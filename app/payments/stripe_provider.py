@@ -0,0 +1,44 @@
+"""Stripe PaymentIntents"""
+import stripe
+
+from payments.base import EVENT_STATUSES, Intent, PaymentError, PaymentProvider, WebhookError, WebhookEvent, to_cents
+
+
+class StripeProvider(PaymentProvider):
+    name = 'stripe'
+
+    def __init__(self, secret_key, webhook_secret, tolerance=300, timeout=10):
+        self.secret_key = secret_key
+        self.webhook_secret = webhook_secret
+        self.tolerance = tolerance
+        stripe.default_http_client = stripe.http_client.RequestsClient(timeout=timeout)
+        stripe.max_network_retries = 2
+
+    def create_intent(self, order, currency):
+        try:
+            intent = stripe.PaymentIntent.create(
+                api_key=self.secret_key,
+                # Retried tasks get the same intent back instead of a second one
+                idempotency_key=f'order-{order.id}',
+                amount=to_cents(order.total),
+                currency=currency,
+                metadata={'order_id': order.id, 'order_number': order.order_number},
+                automatic_payment_methods={'enabled': True},
+            )
+        except stripe.error.StripeError as e:
+            raise PaymentError(str(e)) from e
+        return Intent(intent.id, intent.client_secret, intent.status)
+
+    def parse_webhook(self, payload, headers):
+        try:
+            # Checks the signature and rejects timestamps older than `tolerance`
+            event = stripe.Webhook.construct_event(
+                payload, headers.get('Stripe-Signature', ''), self.webhook_secret,
+                tolerance=self.tolerance
+            )
+        except (ValueError, stripe.error.SignatureVerificationError) as e:
+            raise WebhookError(str(e)) from e
+        obj = event.data.object
+        intent_id = obj.get('payment_intent') if event.type.startswith('charge.') else obj.get('id')
+        return WebhookEvent(event.id, self.name, intent_id,
+                            EVENT_STATUSES.get(event.type), event.created)
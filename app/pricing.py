@@ -0,0 +1,201 @@
+"""Custom case pricing
+
+Material and case type prices come from the reference data snapshot
+(refdata.py), so quotes are computed without touching the database. Each
+snapshot's prices are indexed once into a PriceTable whose version is a digest
+of the prices. All arithmetic is Decimal, matching the Numeric columns.
+"""
+import hashlib
+import itertools
+import threading
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+import refdata
+
+POCKET_PRICE = Decimal('15.00')  # Per extra pocket
+CENT = Decimal('0.01')
+LITER = Decimal(1000)  # cm3 per liter
+MAX_DIMENSION_CM = Decimal(400)
+MAX_POCKETS = 20
+MAX_BATCH_QUOTES = 1000
+
+
+class QuoteError(ValueError):
+    """Invalid custom case specification"""
+
+
+class PriceTable:
+    """Immutable snapshot of the material and case type price tables"""
+    __slots__ = ('version', 'materials', 'case_types', 'source')
+
+    def __init__(self, materials, case_types, source=None):
+        self.materials = materials
+        self.case_types = case_types
+        self.source = source
+        digest = hashlib.sha1()
+        for kind, rows in (('m', materials), ('c', case_types)):
+            for key in sorted(rows):
+                digest.update(f'{kind}:{key}:{rows[key]};'.encode())
+        self.version = digest.hexdigest()[:12]
+
+
+_table = None
+_lock = threading.Lock()
+
+
+def _build(data):
+    materials = {m.id: Decimal(m.price_per_unit) for m in data.custom_materials()}
+    case_types = {c.id: c.price_multiplier for c in data.case_types}
+    return PriceTable(materials, case_types, source=data)
+
+
+def price_table():
+    """Price table for the current reference data snapshot"""
+    global _table
+    data = refdata.snapshot()
+    table = _table
+    if table is not None and table.source is data:
+        return table
+    with _lock:
+        if _table is None or _table.source is not data:
+            _table = _build(data)
+        return _table
+
+
+def _decimal(value, field, maximum=MAX_DIMENSION_CM):
+    try:
+        number = Decimal(str(value))
+    except (InvalidOperation, TypeError):
+        raise QuoteError(f'Valor inválido para {field}')
+    if not number.is_finite() or number < 0 or number > maximum:
+        raise QuoteError(f'Valor fuera de rango para {field}')
+    # Dimensions are priced to 0.01 cm, the same precision the client uses
+    return number.quantize(CENT, ROUND_HALF_UP)
+
+
+def _id(value, field):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise QuoteError(f'Valor inválido para {field}')
+
+
+def _coefficient(table, material_id, case_type_id):
+    material_price = table.materials.get(material_id)
+    multiplier = table.case_types.get(case_type_id)
+    if material_price is None or multiplier is None:
+        raise QuoteError('Material o tipo de funda inválido')
+    return material_price * multiplier
+
+
+def _result(volume, base_price, extra_pockets):
+    pocket_price = extra_pockets * POCKET_PRICE
+    base_price = base_price.quantize(CENT, ROUND_HALF_UP)
+    return {
+        'base_price': base_price,
+        'pocket_price': pocket_price,
+        'total_price': base_price + pocket_price,
+        'volume': volume.quantize(CENT, ROUND_HALF_UP)
+    }
+
+
+def quote(width, height, depth, material_id, case_type_id, extra_pockets=0, table=None):
+    """Price one custom case; returns Decimal base/pocket/total price and volume (l)"""
+    table = table or price_table()
+    width = _decimal(width, 'width')
+    height = _decimal(height, 'height')
+    depth = _decimal(depth, 'depth')
+    extra_pockets = int(_decimal(extra_pockets or 0, 'extra_pockets', MAX_POCKETS))
+    coefficient = _coefficient(table, _id(material_id, 'material_id'), _id(case_type_id, 'case_type_id'))
+
+    volume = width * height * depth / LITER
+    return _result(volume, volume * coefficient, extra_pockets)
+
+
+def quote_grid(widths, heights, depths, material_ids, case_type_ids, extra_pockets=0):
+    """Price every combination of the given dimensions, materials and case types
+
+    Volumes and material x case type coefficients are computed once each, so a
+    grid costs one multiplication per cell.
+    """
+    table = price_table()
+    widths = [_decimal(w, 'width') for w in widths]
+    heights = [_decimal(h, 'height') for h in heights]
+    depths = [_decimal(d, 'depth') for d in depths]
+    extra_pockets = int(_decimal(extra_pockets or 0, 'extra_pockets', MAX_POCKETS))
+    material_ids = [_id(m, 'material_id') for m in material_ids]
+    case_type_ids = [_id(c, 'case_type_id') for c in case_type_ids]
+
+    cells = len(widths) * len(heights) * len(depths) * len(material_ids) * len(case_type_ids)
+    if cells > MAX_BATCH_QUOTES:
+        raise QuoteError(f'Máximo {MAX_BATCH_QUOTES} combinaciones por consulta')
+
+    coefficients = {
+        (m, c): _coefficient(table, m, c)
+        for m, c in itertools.product(material_ids, case_type_ids)
+    }
+    results = []
+    for w, h, d in itertools.product(widths, heights, depths):
+        volume = w * h * d / LITER
+        for (m, c), coefficient in coefficients.items():
+            result = _result(volume, volume * coefficient, extra_pockets)
+            result.update({'width': w, 'height': h, 'depth': d, 'material_id': m, 'case_type_id': c})
+            results.append(result)
+    return table.version, results
+
+
+def quote_many(specs):
+    """Price a list of independent specs; invalid entries carry an 'error' key"""
+    if len(specs) > MAX_BATCH_QUOTES:
+        raise QuoteError(f'Máximo {MAX_BATCH_QUOTES} combinaciones por consulta')
+    table = price_table()
+    results = []
+    for spec in specs:
+        try:
+            results.append(quote(
+                spec.get('width', 0), spec.get('height', 0), spec.get('depth', 0),
+                spec.get('material_id'), spec.get('case_type_id'),
+                spec.get('extra_pockets', 0), table=table
+            ))
+        except (QuoteError, AttributeError) as e:
+            results.append({'error': str(e) if isinstance(e, QuoteError) else 'Datos inválidos'})
+    return table.version, results
+
+
+def price_model():
+    """Compact model the designer UI uses to price locally
+
+    total = round_half_up(width * height * depth / 1000 * coefficient, 2)
+            + extra_pockets * pocket_price
+    Decimals are serialised as strings so the client can do exact arithmetic.
+    """
+    table = price_table()
+    return {
+        'version': table.version,
+        'volume_divisor': str(LITER),
+        'pocket_price': str(POCKET_PRICE),
+        'max_dimension': str(MAX_DIMENSION_CM),
+        'max_pockets': MAX_POCKETS,
+        'rounding': 'half_up',
+        'decimals': 2,
+        'materials': {str(k): str(v) for k, v in table.materials.items()},
+        'case_types': {str(k): str(v) for k, v in table.case_types.items()},
+        'coefficients': {
+            f'{m}:{c}': str(price * multiplier)
+            for m, price in table.materials.items()
+            for c, multiplier in table.case_types.items()
+        }
+    }
+
+
+def matches_quote(quoted_price, price):
+    """Whether a client-side total equals the server quote"""
+    try:
+        return Decimal(str(quoted_price)).quantize(CENT) == price['total_price']
+    except (InvalidOperation, TypeError):
+        return False
+
+
+def as_json(result):
+    """Decimal values to floats for JSON responses"""
+    return {k: float(v) if isinstance(v, Decimal) else v for k, v in result.items()}
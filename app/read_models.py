@@ -0,0 +1,79 @@
+"""Read models for product listings
+
+Listing pages render a handful of fields per product. Selecting just those
+columns into ProductCard tuples skips the large text/JSON columns, the
+identity map and relationship loading that full Product entities bring.
+"""
+from decimal import Decimal
+from typing import NamedTuple, Optional
+
+from flask_sqlalchemy.pagination import Pagination
+from sqlalchemy import func, select
+
+from models import Product, db
+
+
+class ProductCard(NamedTuple):
+    id: int
+    name: str
+    slug: str
+    short_description: Optional[str]
+    price: Decimal
+    compare_price: Optional[Decimal]
+    main_image: Optional[str]
+    stock_quantity: int
+    featured: bool
+    rating_average: Decimal
+    rating_count: int
+    category_id: int
+    brand_id: Optional[int]
+
+    # Same helpers as Product, so templates work with either
+    @property
+    def average_rating(self):
+        return float(self.rating_average or 0)
+
+    @property
+    def review_count(self):
+        return self.rating_count or 0
+
+    @property
+    def is_in_stock(self):
+        return (self.stock_quantity or 0) > 0
+
+    @property
+    def discount_percentage(self):
+        if self.compare_price and self.compare_price > self.price:
+            return int(((self.compare_price - self.price) / self.compare_price) * 100)
+        return 0
+
+
+CARD_COLUMNS = tuple(getattr(Product, field) for field in ProductCard._fields)
+
+
+def card_select(*criteria):
+    """SELECT of the card columns, filtered by `criteria`"""
+    return select(*CARD_COLUMNS).where(*criteria)
+
+
+def cards(stmt):
+    """Run a card_select() and return ProductCards"""
+    return [ProductCard._make(row) for row in db.session.execute(stmt)]
+
+
+class CardPagination(Pagination):
+    """Pagination over a card_select(), yielding ProductCards"""
+
+    def _query_items(self):
+        stmt = self._query_args['select']
+        return cards(stmt.limit(self.per_page).offset(self._query_offset))
+
+    def _query_count(self):
+        stmt = self._query_args['select'].order_by(None)
+        return db.session.execute(
+            select(func.count()).select_from(stmt.subquery())
+        ).scalar()
+
+
+def paginate_cards(stmt, page, per_page, error_out=False):
+    return CardPagination(page=page, per_page=per_page, error_out=error_out, select=stmt)
@@ -0,0 +1,167 @@
+"""Related-product recommendations
+
+A periodic batch job blends three signals into a top-N list per product:
+
+- co-purchase: products bought in the same order (OrderItem)
+- co-wishlist: products saved by the same user (Wishlist)
+- category similarity: same-category products, also used as a fallback
+
+Co-occurrence is counted with sparse matrix products and cosine-normalised so
+best sellers don't dominate every list. Results go to product_recommendations,
+so the detail page reads them with a single indexed query.
+"""
+import time
+
+import click
+import numpy as np
+from flask.cli import with_appcontext
+from scipy import sparse
+from sqlalchemy import delete, insert, select
+
+from metrics import record_cache
+from models import OrderItem, Product, ProductRecommendation, Wishlist, db
+
+TOP_N = 8
+PURCHASE_WEIGHT = 1.0
+WISHLIST_WEIGHT = 0.5
+CATEGORY_WEIGHT = 0.1
+INSERT_BATCH = 10000
+
+
+def _cooccurrence(pairs, index, n_products):
+    """Cosine-normalised item-item co-occurrence from (group, product) pairs"""
+    rows, cols = [], []
+    groups = {}
+    for group_id, product_id in pairs:
+        col = index.get(product_id)
+        if col is None:
+            continue
+        rows.append(groups.setdefault(group_id, len(groups)))
+        cols.append(col)
+    if not rows:
+        empty = sparse.csr_matrix((n_products, n_products), dtype=np.float32)
+        return empty, np.zeros(n_products, dtype=np.float32)
+
+    baskets = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+        shape=(len(groups), n_products)
+    )
+    # Repeated product in a basket counts once
+    baskets.data[:] = 1.0
+    counts = (baskets.T @ baskets).tocsr()
+    occurrences = counts.diagonal()
+    counts.setdiag(0)
+    counts.eliminate_zeros()
+
+    norm = np.sqrt(occurrences)
+    norm[norm == 0] = 1.0
+    inv = sparse.diags(1.0 / norm)
+    return (inv @ counts @ inv).tocsr(), occurrences
+
+
+def compute(top_n=TOP_N):
+    """Return {product_id: [(related_product_id, score), ...]} for active products"""
+    products = db.session.execute(
+        select(Product.id, Product.category_id).where(Product.active.is_(True)).order_by(Product.id)
+    ).all()
+    if not products:
+        return {}
+    ids = np.array([p.id for p in products])
+    categories = np.array([p.category_id for p in products])
+    index = {product_id: i for i, product_id in enumerate(ids.tolist())}
+    n = len(ids)
+
+    purchases = db.session.execute(
+        select(OrderItem.order_id, OrderItem.product_id).where(OrderItem.product_id.isnot(None))
+    )
+    purchase_scores, popularity = _cooccurrence(purchases, index, n)
+    wishlist_scores, _ = _cooccurrence(
+        db.session.execute(select(Wishlist.user_id, Wishlist.product_id)), index, n
+    )
+    scores = (PURCHASE_WEIGHT * purchase_scores + WISHLIST_WEIGHT * wishlist_scores).tocsr()
+
+    # Best sellers per category fill lists that lack behavioural signal
+    fallback = {}
+    order = np.lexsort((-popularity, categories))
+    for i in order:
+        candidates = fallback.setdefault(categories[i], [])
+        if len(candidates) <= top_n:
+            candidates.append(i)
+
+    results = {}
+    for i in range(n):
+        start, end = scores.indptr[i], scores.indptr[i + 1]
+        cols = scores.indices[start:end]
+        values = scores.data[start:end] + CATEGORY_WEIGHT * (categories[cols] == categories[i])
+        if len(cols) > top_n:
+            keep = np.argpartition(-values, top_n)[:top_n]
+            cols, values = cols[keep], values[keep]
+        ranked = sorted(zip(values.tolist(), cols.tolist()), reverse=True)
+
+        chosen = {col for _, col in ranked}
+        for col in fallback.get(categories[i], ()):
+            if len(ranked) >= top_n:
+                break
+            if col != i and col not in chosen:
+                ranked.append((CATEGORY_WEIGHT / 2, col))
+                chosen.add(col)
+
+        if ranked:
+            results[int(ids[i])] = [(int(ids[col]), float(score)) for score, col in ranked]
+    return results
+
+
+def rebuild(top_n=TOP_N):
+    """Recompute and replace all stored recommendations in one transaction"""
+    results = compute(top_n)
+    db.session.execute(delete(ProductRecommendation))
+    batch = []
+    for product_id, related in results.items():
+        for rank, (related_id, score) in enumerate(related):
+            batch.append({
+                'product_id': product_id,
+                'rank': rank,
+                'related_product_id': related_id,
+                'score': score
+            })
+        if len(batch) >= INSERT_BATCH:
+            db.session.execute(insert(ProductRecommendation), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(ProductRecommendation), batch)
+    db.session.commit()
+    return len(results)
+
+
+def related_products(product, limit=4):
+    """Precomputed related products, falling back to same-category ones"""
+    related = Product.query.join(
+        ProductRecommendation, ProductRecommendation.related_product_id == Product.id
+    ).filter(
+        ProductRecommendation.product_id == product.id,
+        Product.active == True
+    ).order_by(ProductRecommendation.rank).limit(limit).all()
+    record_cache('recommendations', bool(related))
+    if related:
+        return related
+
+    # Not computed yet (new product or first deploy)
+    return Product.query.filter(
+        Product.category_id == product.category_id,
+        Product.id != product.id,
+        Product.active == True
+    ).limit(limit).all()
+
+
+@click.command('rebuild-recommendations')
+@click.option('--top-n', default=TOP_N, show_default=True, help='Recommendations kept per product')
+@with_appcontext
+def rebuild_command(top_n):
+    """Recompute related-product recommendations"""
+    start = time.perf_counter()
+    count = rebuild(top_n)
+    click.echo(f'Stored recommendations for {count} products in {time.perf_counter() - start:.1f}s')
+
+
+def init_app(app):
+    app.cli.add_command(rebuild_command)
@@ -0,0 +1,256 @@
+"""Reference data: brands, materials, case types and the category tree
+
+These tables change a few times a year but feed almost every page, so each
+worker keeps one immutable snapshot of all of them as __slots__ objects
+(never ORM instances, so nothing can lazy-load or leak into a session). Any
+committed change to one of the models bumps a version counter in Redis;
+workers compare it at most once per VERSION_CHECK_INTERVAL and rebuild the
+snapshot when it moved (or every DEFAULT_CACHE_TTL seconds if Redis is down).
+
+The category tree keeps every node's path from the root, so subtree filters
+are one `category_id IN (...)` and breadcrumbs need no queries.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+
+import redis
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from extensions import redis_client
+from metrics import record_cache
+from models import Brand, CaseType, Category, Material, db
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'rickbags:refdata:version'
+VERSION_CHECK_INTERVAL = 1.0
+DEFAULT_CACHE_TTL = 300
+MODELS = (Brand, Material, CaseType, Category)
+
+
+@dataclass(frozen=True, slots=True)
+class BrandRef:
+    id: int
+    name: str
+    slug: str
+    logo: str
+    active: bool
+
+
+@dataclass(frozen=True, slots=True)
+class MaterialRef:
+    id: int
+    name: str
+    description: str
+    price_per_unit: Decimal
+    available_for_custom: bool
+    active: bool
+
+
+@dataclass(frozen=True, slots=True)
+class CaseTypeRef:
+    id: int
+    name: str
+    description: str
+    price_multiplier: Decimal
+    active: bool
+
+
+class CategoryNode:
+    """Read-only copy of a Category row plus its place in the tree"""
+    __slots__ = ('id', 'name', 'slug', 'description', 'image', 'parent_id',
+                 'sort_order', 'active', 'path', 'children')
+
+    def __init__(self, row):
+        self.id = row.id
+        self.name = row.name
+        self.slug = row.slug
+        self.description = row.description
+        self.image = row.image
+        self.parent_id = row.parent_id
+        self.sort_order = row.sort_order or 0
+        self.active = row.active
+        self.path = ()  # ids from the root down to this node
+        self.children = []
+
+    def __repr__(self):
+        return f'<CategoryNode {self.name}>'
+
+
+class CategoryTree:
+    __slots__ = ('nodes', 'roots')
+
+    def __init__(self, rows):
+        self.nodes = {row.id: CategoryNode(row) for row in rows}
+        self.roots = []
+        for node in sorted(self.nodes.values(), key=lambda n: (n.sort_order, n.name)):
+            parent = self.nodes.get(node.parent_id)
+            (parent.children if parent else self.roots).append(node)
+        stack = [(node, ()) for node in self.roots]
+        while stack:
+            node, parent_path = stack.pop()
+            node.path = parent_path + (node.id,)
+            stack.extend((child, node.path) for child in node.children)
+
+    def get(self, category_id):
+        return self.nodes.get(category_id)
+
+    def ancestors(self, category_id):
+        """Nodes from the root down to `category_id` (breadcrumbs)"""
+        node = self.nodes.get(category_id)
+        return [self.nodes[i] for i in node.path] if node else []
+
+    def descendant_ids(self, category_id):
+        """`category_id` and every category below it"""
+        node = self.nodes.get(category_id)
+        if node is None:
+            return []
+        ids = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            ids.append(node.id)
+            stack.extend(node.children)
+        return ids
+
+    def ordered(self):
+        """All nodes, depth first in display order"""
+        result = []
+        stack = list(reversed(self.roots))
+        while stack:
+            node = stack.pop()
+            result.append(node)
+            stack.extend(reversed(node.children))
+        return result
+
+
+class RefData:
+    """One worker's snapshot of every reference table"""
+    __slots__ = ('version', 'loaded_at', 'brands', 'materials', 'case_types', 'categories',
+                 '_brands_by_name', '_materials_by_name')
+
+    def __init__(self, brands, materials, case_types, categories, version):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.brands = tuple(sorted(brands, key=lambda b: b.name))
+        self.materials = tuple(sorted(materials, key=lambda m: m.name))
+        self.case_types = tuple(sorted(case_types, key=lambda c: c.name))
+        self.categories = categories
+        self._brands_by_name = {b.name: b for b in self.brands}
+        self._materials_by_name = {m.name: m for m in self.materials}
+
+    def brand_named(self, name):
+        return self._brands_by_name.get(name)
+
+    def material_named(self, name):
+        return self._materials_by_name.get(name)
+
+    def custom_materials(self):
+        return [m for m in self.materials if m.available_for_custom]
+
+
+def _load(version):
+    query = db.session.query
+    brands = [BrandRef(*row) for row in query(
+        Brand.id, Brand.name, Brand.slug, Brand.logo, Brand.active)]
+    materials = [MaterialRef(*row) for row in query(
+        Material.id, Material.name, Material.description, Material.price_per_unit,
+        Material.available_for_custom, Material.active)]
+    case_types = [CaseTypeRef(row.id, row.name, row.description,
+                              Decimal(row.price_multiplier if row.price_multiplier is not None else 1),
+                              row.active)
+                  for row in query(CaseType.id, CaseType.name, CaseType.description,
+                                   CaseType.price_multiplier, CaseType.active)]
+    categories = CategoryTree(query(
+        Category.id, Category.name, Category.slug, Category.description, Category.image,
+        Category.parent_id, Category.sort_order, Category.active
+    ).all())
+    return RefData(brands, materials, case_types, categories, version)
+
+
+_snapshot = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _current_version():
+    try:
+        return int(redis_client.get(VERSION_KEY) or 0)
+    except redis.RedisError:
+        logger.warning('Reference data version unavailable', exc_info=True)
+        return None
+
+
+def snapshot():
+    """Current reference data snapshot"""
+    global _snapshot, _checked_at
+    current = _snapshot
+    now = time.monotonic()
+    if current is not None and now - _checked_at < VERSION_CHECK_INTERVAL:
+        record_cache('refdata', True)
+        return current
+    version = _current_version()
+    if current is not None:
+        ttl = current_app.config.get('REFDATA_CACHE_TTL', DEFAULT_CACHE_TTL)
+        fresh = current.version == version if version is not None else now - current.loaded_at < ttl
+        if fresh:
+            _checked_at = now
+            record_cache('refdata', True)
+            return current
+    with _lock:
+        if _snapshot is current:
+            _snapshot = _load(version)
+            _checked_at = now
+        record_cache('refdata', False)
+        return _snapshot
+
+
+def categories():
+    """Current category tree"""
+    return snapshot().categories
+
+
+def bump():
+    """Tell every worker to rebuild its snapshot"""
+    try:
+        redis_client.incr(VERSION_KEY)
+    except redis.RedisError:
+        logger.warning('Could not bump reference data version', exc_info=True)
+    invalidate()
+
+
+def invalidate():
+    """Drop this worker's snapshot"""
+    global _snapshot
+    _snapshot = None
+
+
+@event.listens_for(Session, 'after_flush')
+def _note_changes(session, flush_context):
+    if any(isinstance(obj, MODELS) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info['refdata_changed'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_on_commit(session):
+    if session.info.pop('refdata_changed', False):
+        bump()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_changes(session):
+    session.info.pop('refdata_changed', None)
+
+
+def breadcrumbs(category_id):
+    """Template helper: category nodes from the root to `category_id`"""
+    return categories().ancestors(category_id)
+
+
+def init_app(app):
+    app.add_template_global(breadcrumbs, 'category_breadcrumbs')
@@ -1,10 +1,18 @@
 """Sample data for RickBags"""
 
-from app import create_app, db
-from app.models import Category, Brand, Material, CaseType, Product, User
-from datetime import datetime
+from app import create_app
+from models import (db, Category, Brand, Material, CaseType, Product, User, Review,
+                    Order, OrderItem, Wishlist, product_materials)
+from sqlalchemy import insert
+from passwords import passwords
+import moderation
+from datetime import datetime, timedelta
+import argparse
+import random
 import json
 
+BATCH_SIZE = 5000
+
 def seed_database():
     """Populate database with sample data"""
     
@@ -268,11 +276,181 @@ def seed_database():
     print("Admin user: admin@rickbags.com / admin123")
     print("Customer user: customer@example.com / customer123")
 
+def _batches(rows, size=BATCH_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+def _bulk_insert(model, rows, returning=None):
+    """Insert rows in batches, optionally returning a column in input order"""
+    returned = []
+    for batch in _batches(rows):
+        stmt = insert(model)
+        if returning is not None:
+            stmt = stmt.returning(returning, sort_by_parameter_order=True)
+            returned.extend(db.session.scalars(stmt, batch).all())
+        else:
+            db.session.execute(stmt, batch)
+    return returned
+
+def _popular_index(rng, size):
+    """Pick an index with a long-tail distribution, like real catalog traffic"""
+    return min(int(rng.paretovariate(1.2)) - 1, size - 1)
+
+def seed_synthetic(products=10000, reviews=None, orders=None, users=None, seed=42):
+    """Populate a synthetic catalog at benchmark scale (10k-1M products)
+    
+    Requires the reference data from seed_database(). Rows are generated from a
+    fixed random seed so runs at the same scale are comparable.
+    """
+    rng = random.Random(seed)
+    reviews = products * 2 if reviews is None else reviews
+    orders = products // 2 if orders is None else orders
+    users = max(orders // 5, 100) if users is None else users
+    
+    category_ids = [c.id for c in Category.query.all()]
+    brand_ids = [b.id for b in Brand.query.all()]
+    material_ids = [m.id for m in Material.query.all()]
+    if not category_ids or not brand_ids:
+        raise RuntimeError('Run seed_database() before seed_synthetic()')
+    
+    now = datetime.utcnow()
+    
+    # One hash for every synthetic user: hashing 200k passwords would dominate the run
+    password_hash = passwords.hash('benchmark123')
+    user_ids = _bulk_insert(User, [
+        {
+            'email': f'bench{i}@example.com',
+            'password_hash': password_hash,
+            'first_name': 'Bench',
+            'last_name': f'User {i}',
+            'is_admin': False,
+            'is_active': True,
+            'created_at': now - timedelta(days=rng.randint(0, 730))
+        }
+        for i in range(users)
+    ], returning=User.id)
+    print(f"Seeded {len(user_ids)} users")
+    
+    product_rows = []
+    for i in range(products):
+        price = round(rng.uniform(19.99, 499.99), 2)
+        width, height, depth = rng.randint(20, 90), rng.randint(15, 70), rng.randint(10, 40)
+        product_rows.append({
+            'name': f'Funda Sintética {i:07d}',
+            'slug': f'funda-sintetica-{i:07d}',
+            'description': 'Funda generada para pruebas de rendimiento. ' * 8,
+            'short_description': 'Funda generada para pruebas de rendimiento',
+            'price': price,
+            'compare_price': round(price * 1.25, 2) if rng.random() < 0.2 else None,
+            'sku': f'BENCH-{i:07d}',
+            'stock_quantity': rng.randint(0, 50),
+            'weight': rng.randint(300, 2500),
+            # Bulk inserts skip ORM events, so set the fitment columns directly
+            'dimensions': {'width': width, 'height': height, 'depth': depth},
+            'width_cm': width,
+            'height_cm': height,
+            'depth_cm': depth,
+            'main_image': '/static/images/products/placeholder.jpg',
+            'features': ['Acolchado de 10mm', 'Asas reforzadas'],
+            'specifications': {'material': 'Nylon', 'padding': '10mm foam'},
+            'category_id': rng.choice(category_ids),
+            'brand_id': rng.choice(brand_ids),
+            'active': rng.random() < 0.95,
+            'featured': rng.random() < 0.01,
+            'created_at': now - timedelta(days=rng.randint(0, 730)),
+            'updated_at': now
+        })
+    product_ids = _bulk_insert(Product, product_rows, returning=Product.id)
+    del product_rows
+    print(f"Seeded {len(product_ids)} products")
+    
+    if material_ids:
+        db.session.execute(insert(product_materials), [
+            {'product_id': product_id, 'material_id': material_id}
+            for product_id in product_ids
+            for material_id in rng.sample(material_ids, rng.randint(1, min(2, len(material_ids))))
+        ])
+    
+    _bulk_insert(Review, [
+        {
+            'product_id': product_ids[_popular_index(rng, len(product_ids))],
+            'user_id': rng.choice(user_ids),
+            'rating': rng.choices([1, 2, 3, 4, 5], weights=[1, 1, 3, 8, 12])[0],
+            'title': 'Reseña sintética',
+            'comment': 'Muy buena protección para el equipo.',
+            'approved': rng.random() < 0.8,
+            'created_at': now - timedelta(days=rng.randint(0, 365))
+        }
+        for _ in range(reviews)
+    ])
+    moderation.refresh_ratings()
+    print(f"Seeded {reviews} reviews")
+    
+    order_rows = []
+    item_rows = []
+    for i in range(orders):
+        items = []
+        for _ in range(rng.randint(1, 4)):
+            product_id = product_ids[_popular_index(rng, len(product_ids))]
+            items.append({
+                'product_id': product_id,
+                'product_name': f'Producto {product_id}',
+                'price': round(rng.uniform(19.99, 499.99), 2),
+                'quantity': rng.randint(1, 3)
+            })
+        subtotal = sum(item['price'] * item['quantity'] for item in items)
+        order_rows.append({
+            'order_number': f'B{i:09d}',
+            'user_id': rng.choice(user_ids),
+            'subtotal': subtotal,
+            'shipping_cost': 15.0,
+            'tax': round(subtotal * 0.08, 2),
+            'total': round(subtotal * 1.08 + 15.0, 2),
+            'status': rng.choice(['pending', 'processing', 'shipped', 'delivered', 'delivered']),
+            'payment_status': 'paid',
+            'shipping_address': 'Calle Falsa 123, Madrid, Madrid 28001, España',
+            'created_at': now - timedelta(days=rng.randint(0, 365))
+        })
+        item_rows.append(items)
+    order_ids = _bulk_insert(Order, order_rows, returning=Order.id)
+    _bulk_insert(OrderItem, [
+        dict(item, order_id=order_id)
+        for order_id, items in zip(order_ids, item_rows)
+        for item in items
+    ])
+    del order_rows, item_rows
+    print(f"Seeded {len(order_ids)} orders")
+    
+    wishlist_pairs = {
+        (rng.choice(user_ids), product_ids[_popular_index(rng, len(product_ids))])
+        for _ in range(users * 3)
+    }
+    _bulk_insert(Wishlist, [
+        {'user_id': user_id, 'product_id': product_id, 'created_at': now}
+        for user_id, product_id in wishlist_pairs
+    ])
+    print(f"Seeded {len(wishlist_pairs)} wishlist items")
+    
+    db.session.commit()
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Seed the RickBags database')
+    parser.add_argument('--products', type=int, default=0,
+                        help='Also seed a synthetic catalog of this many products (10000-1000000)')
+    parser.add_argument('--reviews', type=int, help='Synthetic reviews (default: 2 per product)')
+    parser.add_argument('--orders', type=int, help='Synthetic orders (default: 1 per 2 products)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for reproducible data')
+    args = parser.parse_args()
+    
     app = create_app()
     with app.app_context():
         # Create all tables
         db.create_all()
         
         # Seed data
-        seed_database()
\ No newline at end of file
+        if not Category.query.first():
+            seed_database()
+        
+        if args.products:
+            seed_synthetic(products=args.products, reviews=args.reviews,
+                           orders=args.orders, seed=args.seed)
\ No newline at end of file
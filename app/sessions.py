@@ -0,0 +1,107 @@
+"""Lean Redis-backed sessions
+
+Flask-Session's Redis interface pickles the whole session and rewrites it
+(SETEX plus Set-Cookie) on every request that has a session, even when the
+view only read it. This interface:
+
+- serialises with Flask's tagged JSON (compact, no pickle),
+- writes only when the session was modified,
+- refreshes the Redis TTL lazily: an unmodified session is rewritten only once
+  it is older than half its lifetime, so active visitors never expire.
+
+Sessions stored by the old pickle serializer fail to decode and start empty.
+"""
+import logging
+import time
+
+from flask.json.tag import TaggedJSONSerializer
+from flask_session.sessions import RedisSession, RedisSessionInterface, total_seconds
+from itsdangerous import BadSignature, want_bytes
+
+logger = logging.getLogger(__name__)
+
+# Fraction of the session lifetime after which a read-only hit rewrites the TTL
+REFRESH_AFTER = 0.5
+
+
+class LeanRedisSession(RedisSession):
+    def __init__(self, initial=None, sid=None, permanent=None, written_at=None):
+        super().__init__(initial, sid=sid, permanent=permanent)
+        self.written_at = written_at
+
+
+class LeanRedisSessionInterface(RedisSessionInterface):
+    serializer = TaggedJSONSerializer()
+    session_class = LeanRedisSession
+
+    def _sid(self, app, request):
+        sid = request.cookies.get(app.config['SESSION_COOKIE_NAME'])
+        if not sid:
+            return None
+        if self.use_signer:
+            try:
+                return self._get_signer(app).unsign(sid).decode()
+            except BadSignature:
+                return None
+        return sid
+
+    def open_session(self, app, request):
+        sid = self._sid(app, request)
+        if sid is None:
+            return self.session_class(sid=self._generate_sid(), permanent=self.permanent)
+
+        payload = self.redis.get(self.key_prefix + sid)
+        if payload is not None:
+            try:
+                envelope = self.serializer.loads(payload)
+                return self.session_class(envelope['d'], sid=sid, written_at=envelope['t'])
+            except (ValueError, KeyError, TypeError, UnicodeDecodeError):
+                logger.info('Discarding undecodable session %s', sid)
+        return self.session_class(sid=sid, permanent=self.permanent)
+
+    def _needs_refresh(self, app, session):
+        if session.written_at is None:
+            return True
+        lifetime = total_seconds(app.permanent_session_lifetime)
+        return time.time() - session.written_at > lifetime * REFRESH_AFTER
+
+    def save_session(self, app, session, response):
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if session.modified:
+                self.redis.delete(self.key_prefix + session.sid)
+                response.delete_cookie(app.config['SESSION_COOKIE_NAME'], domain=domain, path=path)
+            return
+
+        if not session.modified and not self._needs_refresh(app, session):
+            return
+
+        payload = self.serializer.dumps({'t': int(time.time()), 'd': dict(session)})
+        self.redis.setex(name=self.key_prefix + session.sid, value=payload,
+                         time=total_seconds(app.permanent_session_lifetime))
+
+        if self.use_signer:
+            session_id = self._get_signer(app).sign(want_bytes(session.sid)).decode()
+        else:
+            session_id = session.sid
+        response.set_cookie(
+            app.config['SESSION_COOKIE_NAME'], session_id,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain, path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+
+
+def init_app(app):
+    """Install the lean interface in place of Flask-Session's"""
+    config = app.config
+    config.setdefault('SESSION_KEY_PREFIX', 'session:')
+    config.setdefault('SESSION_USE_SIGNER', False)
+    config.setdefault('SESSION_PERMANENT', True)
+    app.session_interface = LeanRedisSessionInterface(
+        config['SESSION_REDIS'], config['SESSION_KEY_PREFIX'],
+        config['SESSION_USE_SIGNER'], config['SESSION_PERMANENT']
+    )
@@ -0,0 +1,195 @@
+// RickBags Custom Case Designer
+//
+// Prices the custom case locally from the server's published price model
+// (/products/custom-case/price-model), so moving the sliders never hits the
+// server. The server re-validates the quoted price in /add-custom-to-cart.
+
+const CustomCasePricing = (function () {
+  const MODEL_URL = "/products/custom-case/price-model";
+  let modelPromise = null;
+
+  function loadModel(revalidate = false) {
+    if (!modelPromise || revalidate) {
+      // The model is cacheable (ETag + max-age); revalidate after a 409
+      modelPromise = fetch(MODEL_URL, {
+        cache: revalidate ? "no-cache" : "default",
+      })
+        .then((response) => {
+          if (!response.ok) throw new Error("Price model unavailable");
+          return response.json();
+        })
+        .catch((error) => {
+          modelPromise = null;
+          throw error;
+        });
+    }
+    return modelPromise;
+  }
+
+  // Decimal string -> BigInt scaled by 10^scale, rounding half up
+  function toScaled(value, scale) {
+    const text = String(value).trim();
+    const match = /^(\d*)(?:\.(\d*))?$/.exec(text);
+    if (!match || text === "" || text === ".") return null;
+    const intPart = match[1] || "0";
+    const fracPart = match[2] || "";
+    const kept = (fracPart + "0".repeat(scale)).slice(0, scale);
+    let scaled = BigInt(intPart + kept);
+    if (fracPart.length > scale && fracPart[scale] >= "5") {
+      scaled += 1n;
+    }
+    return scaled;
+  }
+
+  function divideHalfUp(numerator, denominator) {
+    const quotient = numerator / denominator;
+    const remainder = numerator % denominator;
+    return remainder * 2n >= denominator ? quotient + 1n : quotient;
+  }
+
+  function centsToString(cents) {
+    const negative = cents < 0n;
+    const abs = negative ? -cents : cents;
+    const units = abs / 100n;
+    const fraction = (abs % 100n).toString().padStart(2, "0");
+    return `${negative ? "-" : ""}${units}.${fraction}`;
+  }
+
+  // Mirrors pricing.quote(): exact integer arithmetic, rounded like Decimal ROUND_HALF_UP
+  function quote(model, spec) {
+    const width = toScaled(spec.width, 2);
+    const height = toScaled(spec.height, 2);
+    const depth = toScaled(spec.depth, 2);
+    const coefficient = model.coefficients[`${spec.material_id}:${spec.case_type_id}`];
+    const pockets = parseInt(spec.extra_pockets || 0, 10);
+    const maxDimension = toScaled(model.max_dimension, 2);
+
+    if (width === null || height === null || depth === null || !coefficient) {
+      return null;
+    }
+    if ([width, height, depth].some((d) => d > maxDimension)) return null;
+    if (isNaN(pockets) || pockets < 0 || pockets > model.max_pockets) return null;
+
+    const divisor = BigInt(model.volume_divisor);
+    const volume = width * height * depth; // scaled by 10^6, in cm3
+    // price = volume / divisor * coefficient; coefficient scaled by 10^4
+    const baseCents = divideHalfUp(
+      volume * toScaled(coefficient, 4) * 100n,
+      10n ** 10n * divisor
+    );
+    const pocketCents = BigInt(pockets) * toScaled(model.pocket_price, 2);
+    const volumeCenti = divideHalfUp(volume * 100n, 10n ** 6n * divisor);
+
+    return {
+      base_price: centsToString(baseCents),
+      pocket_price: centsToString(pocketCents),
+      total_price: centsToString(baseCents + pocketCents),
+      volume: centsToString(volumeCenti),
+      version: model.version,
+      // Dimensions as priced (0.01 cm), sent back so the server quotes the same values
+      dimensions: {
+        width: centsToString(width),
+        height: centsToString(height),
+        depth: centsToString(depth),
+      },
+    };
+  }
+
+  return { loadModel, quote };
+})();
+
+function initCustomCaseDesigner() {
+  const form = document.querySelector("[data-custom-case-form]");
+  if (!form) return;
+
+  const output = {
+    base: form.querySelector("[data-price-base]"),
+    pockets: form.querySelector("[data-price-pockets]"),
+    total: form.querySelector("[data-price-total]"),
+    volume: form.querySelector("[data-price-volume]"),
+  };
+  let currentQuote = null;
+
+  function readSpec() {
+    const value = (name) => {
+      const field = form.elements[name];
+      return field ? field.value : "";
+    };
+    return {
+      width: value("width"),
+      height: value("height"),
+      depth: value("depth"),
+      material_id: value("material_id"),
+      case_type_id: value("case_type_id"),
+      extra_pockets: value("extra_pockets") || 0,
+      border_color: value("border_color") || "black",
+    };
+  }
+
+  function render(result) {
+    currentQuote = result;
+    const text = (amount) => (result ? formatCurrency(Number(amount)) : "—");
+    if (output.base) output.base.textContent = text(result && result.base_price);
+    if (output.pockets) output.pockets.textContent = text(result && result.pocket_price);
+    if (output.total) output.total.textContent = text(result && result.total_price);
+    if (output.volume) {
+      output.volume.textContent = result ? `${result.volume} L` : "—";
+    }
+  }
+
+  function update(revalidate = false) {
+    return CustomCasePricing.loadModel(revalidate)
+      .then((model) => render(CustomCasePricing.quote(model, readSpec())))
+      .catch((error) => {
+        console.error("Price model error:", error);
+        render(null);
+      });
+  }
+
+  form.addEventListener("input", () => update());
+  form.addEventListener("change", () => update());
+
+  form.addEventListener("submit", function (e) {
+    e.preventDefault();
+    if (!currentQuote) {
+      showNotification("error", "Completa las medidas de la funda");
+      return;
+    }
+
+    fetch("/products/add-custom-to-cart", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(
+        Object.assign({}, readSpec(), currentQuote.dimensions, {
+          quoted_price: currentQuote.total_price,
+          price_version: currentQuote.version,
+        })
+      ),
+    })
+      .then((response) =>
+        response.json().then((data) => ({ status: response.status, data }))
+      )
+      .then(({ status, data }) => {
+        if (status === 409 && data.price_changed) {
+          // Prices changed since the model was cached: refresh and show the new total
+          update(true);
+          showNotification("warning", data.error);
+        } else if (status >= 400) {
+          showNotification("error", data.error || "No se pudo agregar la funda");
+        } else {
+          document.dispatchEvent(
+            new CustomEvent("cartUpdated", { detail: { message: data.message } })
+          );
+        }
+      })
+      .catch((error) => {
+        console.error("Custom case error:", error);
+      });
+  });
+
+  update();
+}
+
+document.addEventListener("DOMContentLoaded", initCustomCaseDesigner);
+
+window.RickBags = Object.assign(window.RickBags || {}, { CustomCasePricing });
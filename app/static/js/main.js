@@ -32,22 +32,108 @@ function initMobileNav() {
 }
 
 // Search Functionality
+//
+// Autocomplete waits for a pause in typing, aborts superseded requests and
+// keeps recent results in a small LRU. A query that extends a cached query
+// whose result was complete (fewer rows than requested) is answered locally by
+// filtering that result the way the server does: a case-sensitive substring
+// match on the product name, ordered by name.
+const SEARCH_MIN_LENGTH = 2;
+const SEARCH_DEBOUNCE_MS = 250;
+const SEARCH_FETCH_LIMIT = 20;
+const SEARCH_DISPLAY_LIMIT = 5;
+const SEARCH_CACHE_SIZE = 50;
+
+const SearchCache = (function () {
+  const entries = new Map();
+
+  function get(query) {
+    if (!entries.has(query)) return undefined;
+    const results = entries.get(query);
+    // Re-insert so the Map's insertion order tracks recency
+    entries.delete(query);
+    entries.set(query, results);
+    return results;
+  }
+
+  function set(query, results) {
+    entries.delete(query);
+    entries.set(query, results);
+    if (entries.size > SEARCH_CACHE_SIZE) {
+      entries.delete(entries.keys().next().value);
+    }
+  }
+
+  // Exact hit, or a complete result for a shorter prefix filtered locally
+  function lookup(query) {
+    const exact = get(query);
+    if (exact) return exact;
+    for (let length = query.length - 1; length >= SEARCH_MIN_LENGTH; length--) {
+      const shorter = get(query.slice(0, length));
+      if (shorter && shorter.length < SEARCH_FETCH_LIMIT) {
+        const results = shorter.filter((product) => product.name.includes(query));
+        set(query, results);
+        return results;
+      }
+    }
+    return undefined;
+  }
+
+  return { lookup, set };
+})();
+
 function initSearchFunctionality() {
   const searchInput = document.querySelector(".search-input");
   const searchResults = document.querySelector(".search-results");
   let searchTimeout;
+  let controller = null;
+  let latestQuery = "";
+
+  function cancelPending() {
+    clearTimeout(searchTimeout);
+    if (controller) {
+      controller.abort();
+      controller = null;
+    }
+  }
+
+  function fetchResults(query) {
+    controller = new AbortController();
+    const params = new URLSearchParams({ q: query, limit: SEARCH_FETCH_LIMIT });
+    fetch(`/api/products/search?${params}`, { signal: controller.signal })
+      .then((response) => {
+        if (!response.ok) throw new Error(`Search failed (${response.status})`);
+        return response.json();
+      })
+      .then((data) => {
+        SearchCache.set(query, data);
+        if (query === latestQuery) {
+          displaySearchResults(data.slice(0, SEARCH_DISPLAY_LIMIT));
+        }
+      })
+      .catch((error) => {
+        if (error.name !== "AbortError") {
+          console.error("Search error:", error);
+        }
+      });
+  }
 
   if (searchInput) {
     searchInput.addEventListener("input", function () {
-      clearTimeout(searchTimeout);
+      cancelPending();
       const query = this.value.trim();
+      latestQuery = query;
 
-      if (query.length >= 2) {
-        searchTimeout = setTimeout(() => {
-          performSearch(query);
-        }, 300);
-      } else if (searchResults) {
-        searchResults.style.display = "none";
+      if (query.length < SEARCH_MIN_LENGTH) {
+        if (searchResults) searchResults.style.display = "none";
+        return;
+      }
+
+      const cached = SearchCache.lookup(query);
+      if (cached) {
+        displaySearchResults(cached.slice(0, SEARCH_DISPLAY_LIMIT));
+      } else {
+        searchTimeout = setTimeout(() => fetchResults(query), SEARCH_DEBOUNCE_MS);
       }
     });
 
@@ -60,17 +146,6 @@ function initSearchFunctionality() {
   }
 }
 
-function performSearch(query) {
-  fetch(`/api/products/search?q=${encodeURIComponent(query)}&limit=5`)
-    .then((response) => response.json())
-    .then((data) => {
-      displaySearchResults(data);
-    })
-    .catch((error) => {
-      console.error("Search error:", error);
-    });
-}
-
 function displaySearchResults(results) {
   let searchResults = document.querySelector(".search-results");
 
@@ -363,10 +438,11 @@ window.addEventListener("unhandledrejection", function (e) {
 });
 
 // Export functions for use in other scripts
-window.RickBags = {
+window.RickBags = Object.assign(window.RickBags || {}, {
   showNotification,
   updateCartDisplay,
   formatCurrency,
   debounce,
   throttle,
-};
+  SearchCache,
+});
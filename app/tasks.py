@@ -0,0 +1,105 @@
+"""Background jobs
+
+Run by the Celery worker (see worker.py). The web app only calls init_app so
+it can publish; code that enqueues (orders.py) sends by task name through
+`extensions.celery`, so a request pays for one broker publish and nothing else.
+"""
+import logging
+import os
+
+from flask_mail import Message
+from sqlalchemy.exc import InterfaceError, OperationalError, TimeoutError as PoolTimeout
+from sqlalchemy.orm import joinedload
+
+from extensions import celery, mail
+from models import Order, OrderEvent
+import orders
+import payments
+
+logger = logging.getLogger(__name__)
+
+
+def init_app(app):
+    """Point Celery at the broker and run every task inside an app context"""
+    app.config.setdefault('CELERY_BROKER_URL',
+                          os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/1'))
+    celery.conf.update(
+        broker_url=app.config['CELERY_BROKER_URL'],
+        task_ignore_result=True,
+        # Publishing runs on request threads after commit: with the broker down,
+        # make one connection attempt and fail (callers log it) instead of
+        # letting kombu retry inside the request
+        task_publish_retry=False,
+        broker_transport_options={'max_retries': 0, 'socket_connect_timeout': 1, 'socket_timeout': 2},
+        # Redeliver if a worker dies mid-task; tasks here are safe to repeat
+        task_acks_late=True,
+        worker_prefetch_multiplier=1,
+        # Provider calls and webhook bursts get their own queue
+        task_routes={'tasks.create_payment_intent': {'queue': 'payments'},
+                     'tasks.process_payment_event': {'queue': 'payments'}},
+    )
+
+    class ContextTask(celery.Task):
+        def __call__(self, *args, **kwargs):
+            with app.app_context():
+                return self.run(*args, **kwargs)
+
+    celery.Task = ContextTask
+    return celery
+
+
+def _status_email(order_event):
+    order = order_event.order
+    label = orders.STATUS_LABELS.get(order_event.to_status, order_event.to_status)
+    msg = Message(f'Tu pedido #{order.order_number}: {label} - RickBags',
+                  recipients=[order.user.email])
+    lines = [f'Hola {order.user.first_name},', '',
+             f'El estado de tu pedido #{order.order_number} es ahora: {label}.']
+    if order_event.to_status == 'shipped' and order.tracking_number:
+        lines.append(f'Número de seguimiento: {order.tracking_number}')
+    lines += ['', 'Gracias por comprar en RickBags.']
+    msg.body = '\n'.join(lines)
+    return msg
+
+
+@celery.task(name='tasks.order_events_committed')
+def order_events_committed(event_ids):
+    """Notify customers about committed order events and refresh the rollup once"""
+    events = OrderEvent.query.options(
+        joinedload(OrderEvent.order).joinedload(Order.user)
+    ).filter(OrderEvent.id.in_(event_ids)).order_by(OrderEvent.id).all()
+
+    orders.refresh_rollup()
+
+    with mail.connect() as conn:
+        for order_event in events:
+            if order_event.from_status is None:
+                continue  # checkout already confirms new orders on screen
+            try:
+                conn.send(_status_email(order_event))
+            except Exception:
+                logger.exception('Could not email order event %s', order_event.id)
+
+
+@celery.task(name='tasks.create_payment_intent', autoretry_for=(payments.PaymentError,),
+             retry_backoff=True, max_retries=5)
+def create_payment_intent(order_id):
+    """Create the provider payment intent for a new order"""
+    payments.create_intent(order_id)
+
+
+def _forget_payment_event(task, exc, task_id, args, kwargs, einfo):
+    # Out of retries: let the provider's next redelivery past the dedupe
+    payments.forget_webhook(args[0])
+
+
+# Lost connections, failovers, pool exhaustion; apply_event() is safe to repeat
+TRANSIENT_DB_ERRORS = (OperationalError, InterfaceError, PoolTimeout)
+
+
+@celery.task(name='tasks.process_payment_event', autoretry_for=TRANSIENT_DB_ERRORS,
+             retry_backoff=True, max_retries=5, on_failure=_forget_payment_event)
+def process_payment_event(event):
+    """Apply a verified provider webhook event to its order"""
+    if payments.apply_event(event) is None:
+        logger.info('Payment event %s changed nothing', event['id'])
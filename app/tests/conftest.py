@@ -0,0 +1,35 @@
+import os
+import sys
+
+import fakeredis
+import pytest
+
+# The app imports its modules by top-level name (as gunicorn and Celery run it)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from extensions import celery, redis_client  # noqa: E402
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setenv('PAYMENT_PROVIDER', 'fake')
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = fakeredis.FakeRedis()
+    monkeypatch.setattr(redis_client, '_client', client)
+    monkeypatch.setattr(redis_client, '_pid', os.getpid())
+    return client
+
+
+@pytest.fixture
+def sent_tasks(monkeypatch):
+    """Tasks published through extensions.celery, as (name, args)"""
+    sent = []
+    monkeypatch.setattr(celery, 'send_task', lambda name, args=None, **kwargs: sent.append((name, args)))
+    return sent
@@ -0,0 +1,151 @@
+import time
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+import payments
+import tasks
+from models import db
+
+WEBHOOK_URL = '/payments/webhook/fake'
+
+
+def _delivery(app, event_type='payment_intent.succeeded', intent_id='fake_pi_1', timestamp=None):
+    with app.app_context():
+        fake = payments.provider()
+    payload = fake.event_payload(intent_id, event_type)
+    return payload, fake.sign(payload, timestamp=timestamp)
+
+
+def _post(client, payload, headers):
+    return client.post(WEBHOOK_URL, data=payload, headers=headers, content_type='application/json')
+
+
+def test_signed_delivery_is_queued_once(app, fake_redis, sent_tasks):
+    payload, headers = _delivery(app)
+    client = app.test_client()
+
+    first = _post(client, payload, headers)
+    again = _post(client, payload, headers)
+
+    assert first.status_code == 200 and first.json['duplicate'] is False
+    assert again.status_code == 200 and again.json['duplicate'] is True
+    assert len(sent_tasks) == 1
+    name, (event,) = sent_tasks[0]
+    assert name == 'tasks.process_payment_event'
+    assert event['intent_id'] == 'fake_pi_1' and event['payment_status'] == 'paid'
+
+
+@pytest.mark.parametrize('tamper', [
+    lambda payload, headers: (payload + b' ', headers),
+    lambda payload, headers: (payload, {}),
+    lambda payload, headers: (payload, {'Fake-Signature': 't=abc,v1=def'}),
+])
+def test_bad_signature_is_rejected(app, fake_redis, sent_tasks, tamper):
+    payload, headers = tamper(*_delivery(app))
+
+    response = _post(app.test_client(), payload, headers)
+
+    assert response.status_code == 400
+    assert sent_tasks == []
+    assert fake_redis.keys(f'{payments.WEBHOOK_KEY}*') == []
+
+
+def test_stale_timestamp_is_rejected(app, fake_redis, sent_tasks):
+    tolerance = app.config['PAYMENT_WEBHOOK_TOLERANCE']
+    payload, headers = _delivery(app, timestamp=int(time.time()) - tolerance - 5)
+
+    response = _post(app.test_client(), payload, headers)
+
+    assert response.status_code == 400
+    assert sent_tasks == []
+
+
+def test_queue_failure_lets_redelivery_through(app, fake_redis, sent_tasks, monkeypatch):
+    payload, headers = _delivery(app)
+    client = app.test_client()
+
+    def broker_down(*args, **kwargs):
+        raise ConnectionError('broker down')
+    with monkeypatch.context() as m:
+        m.setattr(payments.celery, 'send_task', broker_down)
+        assert _post(client, payload, headers).status_code == 503
+
+    response = _post(client, payload, headers)
+    assert response.json['duplicate'] is False
+    assert len(sent_tasks) == 1
+
+
+def test_failed_processing_lets_redelivery_through(app, fake_redis, sent_tasks):
+    payload, headers = _delivery(app)
+    client = app.test_client()
+    _post(client, payload, headers)
+    (_, (event,)), = sent_tasks
+
+    # What the worker runs once process_payment_event is out of retries
+    tasks.process_payment_event.on_failure(RuntimeError('db down'), 'task-id', [event], {}, None)
+
+    response = _post(client, payload, headers)
+    assert response.json['duplicate'] is False
+    assert len(sent_tasks) == 2
+
+
+class _RecordingSession:
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, stmt, *args, **kwargs):
+        self.statements.append(stmt)
+        return self
+
+    def scalar(self):
+        return None  # no order matched the guard
+
+    def remove(self):
+        pass  # app context teardown
+
+
+def _event(payment_status, intent_id='fake_pi_1'):
+    return {'id': 'evt_1', 'provider': 'fake', 'intent_id': intent_id,
+            'payment_status': payment_status, 'created': int(time.time())}
+
+
+@pytest.mark.parametrize('payment_status, sources', [
+    ('paid', ['pending', 'failed']),
+    ('failed', ['pending']),
+    ('refunded', ['paid']),
+])
+def test_status_update_is_guarded_by_current_status(app, monkeypatch, payment_status, sources):
+    session = _RecordingSession()
+    with app.app_context():
+        monkeypatch.setattr(db, 'session', session)
+        assert payments.apply_event(_event(payment_status)) is None
+
+    (stmt,) = session.statements
+    compiled = stmt.compile(dialect=postgresql.dialect())
+    assert 'WHERE orders.payment_id = ' in str(compiled)
+    assert 'coalesce(orders.payment_status' in str(compiled)
+    params = compiled.params
+    assert 'fake_pi_1' in params.values()
+    assert sources in params.values()
+    assert params['payment_status'] == payment_status
+
+
+@pytest.mark.parametrize('event', [_event(None), _event('paid', intent_id=None)])
+def test_irrelevant_events_do_not_touch_orders(app, monkeypatch, event):
+    session = _RecordingSession()
+    with app.app_context():
+        monkeypatch.setattr(db, 'session', session)
+        assert payments.apply_event(event) is None
+    assert session.statements == []
+
+
+def test_stripe_requires_webhook_secret(monkeypatch):
+    from app import create_app
+    monkeypatch.setenv('PAYMENT_PROVIDER', 'stripe')
+    monkeypatch.setenv('STRIPE_SECRET_KEY', 'sk_test_x')
+    monkeypatch.delenv('STRIPE_WEBHOOK_SECRET', raising=False)
+
+    with pytest.raises(RuntimeError, match='STRIPE_WEBHOOK_SECRET'):
+        create_app()
+
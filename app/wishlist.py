@@ -0,0 +1,145 @@
+"""Wishlist service
+
+A user's wishlisted product ids are loaded once into a Redis set and read at
+most once per request, so templates can mark any number of products as
+"hearted" with `in_wishlist(product.id)` at no query cost. Writes are single
+set-based statements (INSERT ... ON CONFLICT DO NOTHING / DELETE ...
+RETURNING); after commit they apply the same change to the cached set, if
+there is one, and bump a per-user version. A reload from the database WATCHes
+that version, so a reload that raced with a write is not cached. Redis errors
+fall back to the database.
+"""
+import logging
+from datetime import datetime
+
+import redis
+from flask import g
+from flask_login import current_user
+from sqlalchemy import Integer, any_, delete, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+
+from extensions import redis_client
+from models import Product, Wishlist, db
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'rickbags:wishlist:'
+TTL = 3600
+# Product ids start at 1; the marker keeps an empty wishlist cached too
+LOADED = 0
+MAX_BATCH = 200
+
+
+def _key(user_id):
+    return f'{KEY_PREFIX}{user_id}'
+
+
+def _version_key(user_id):
+    return f'{KEY_PREFIX}{user_id}:version'
+
+
+def _ids(ids):
+    return any_(literal(list(ids), ARRAY(Integer)))
+
+
+def _load(user_id):
+    return set(db.session.execute(
+        select(Wishlist.product_id).where(Wishlist.user_id == user_id)
+    ).scalars())
+
+
+def _reload(user_id):
+    """Load from the database and cache the set unless a write landed meanwhile"""
+    with redis_client.pipeline() as pipe:
+        pipe.watch(_version_key(user_id))
+        ids = _load(user_id)
+        pipe.multi()
+        pipe.sadd(_key(user_id), LOADED, *ids)
+        pipe.expire(_key(user_id), TTL)
+        try:
+            pipe.execute()
+        except redis.WatchError:
+            pass  # the next read reloads
+    return ids
+
+
+def product_ids(user_id):
+    """Set of product ids in the user's wishlist"""
+    try:
+        members = redis_client.smembers(_key(user_id))
+        if members:
+            return {int(m) for m in members} - {LOADED}
+        return _reload(user_id)
+    except redis.RedisError:
+        logger.warning('Wishlist cache unavailable', exc_info=True)
+        return _load(user_id)
+
+
+def _apply(user_id, command, ids):
+    """Apply a committed SADD/SREM to the cached set, only if it is cached"""
+    g.pop('wishlist_ids', None)
+    key = _key(user_id)
+
+    def update(pipe):
+        cached = pipe.exists(key)
+        pipe.multi()
+        pipe.incr(_version_key(user_id))
+        pipe.expire(_version_key(user_id), TTL)
+        if cached:
+            getattr(pipe, command)(key, *ids)
+
+    try:
+        # Retried if a reload creates the set between EXISTS and EXEC
+        redis_client.transaction(update, key)
+    except redis.RedisError:
+        logger.warning('Could not update wishlist cache for user %s', user_id, exc_info=True)
+        try:
+            redis_client.delete(key)
+        except redis.RedisError:
+            pass
+
+
+def in_wishlist(product_id):
+    """Template helper: is `product_id` in the current user's wishlist"""
+    if not current_user.is_authenticated:
+        return False
+    if 'wishlist_ids' not in g:
+        g.wishlist_ids = product_ids(current_user.id)
+    return product_id in g.wishlist_ids
+
+
+def add(user_id, ids):
+    """Add active products to the wishlist; returns the ids actually added"""
+    if not ids:
+        return []
+    added = db.session.execute(
+        insert(Wishlist).from_select(
+            ['user_id', 'product_id', 'created_at'],
+            select(literal(user_id), Product.id, literal(datetime.utcnow()))
+            .where(Product.id == _ids(ids), Product.active.is_(True))
+        ).on_conflict_do_nothing(index_elements=['user_id', 'product_id'])
+        .returning(Wishlist.product_id)
+    ).scalars().all()
+    db.session.commit()
+    if added:
+        _apply(user_id, 'sadd', added)
+    return added
+
+
+def remove(user_id, ids):
+    """Remove products from the wishlist; returns the ids actually removed"""
+    if not ids:
+        return []
+    removed = db.session.execute(
+        delete(Wishlist).where(Wishlist.user_id == user_id, Wishlist.product_id == _ids(ids))
+        .returning(Wishlist.product_id),
+        execution_options={'synchronize_session': False}
+    ).scalars().all()
+    db.session.commit()
+    if removed:
+        _apply(user_id, 'srem', removed)
+    return removed
+
+
+def init_app(app):
+    app.add_template_global(in_wishlist)
@@ -0,0 +1,7 @@
+"""Celery worker entry point: celery -A worker.celery worker"""
+from app import create_app
+from extensions import celery
+
+__all__ = ['app', 'celery']
+
+app = create_app()
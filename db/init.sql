@@ -1,8 +1,6 @@
 -- Initial database setup for RickBags
+-- Tables and indexes are created by the application (models / migrations),
+-- which run after this script, so only extensions belong here.
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
-
--- Create indexes for better performance
-CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
-CREATE INDEX IF NOT EXISTS idx_products_category ON products(category);
-CREATE INDEX IF NOT EXISTS idx_orders_user_id ON orders(user_id);
-CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status);
\ No newline at end of file
+-- Multi-dimensional GiST index for equipment/product fit matching
+CREATE EXTENSION IF NOT EXISTS "cube";